@@ -9,15 +9,21 @@ Mock Paper Generator API
 """
 
 import os
-import io
+import asyncio
+import shutil
 import tempfile
+import time
 import zipfile
 import traceback
 from pathlib import Path
-from typing import Optional
+from typing import Iterable, Optional
+import aiofiles
 from fastapi import FastAPI, UploadFile, File, Form, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, JSONResponse
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, ORJSONResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 from dotenv import load_dotenv
 
 # --------------------------------------------------------
@@ -38,29 +44,121 @@ print("[DEBUG] OPENAI_API_KEY after load:", os.getenv("OPENAI_API_KEY"))
 
 try:
     from src.core.pipeline import run_pipeline_end_to_end
+    from src.core.bootstrap import ensure_easyocr_weights
 except Exception as e:
     raise RuntimeError(f"Failed to import pipeline from src.core: {e}")
 
 # =========================
 # App setup
 # =========================
-app = FastAPI(title="Mock Paper Generator API")
+UPLOAD_CHUNK_SIZE = 1 << 20  # 1 MiB per read when spooling uploads to disk
+TMP_PREFIX = "mockpaper_"
+TMP_MAX_AGE = 60 * 60        # seconds before an abandoned request dir is swept
+JANITOR_INTERVAL = 5 * 60    # seconds between sweeps
+
+app = FastAPI(title="Mock Paper Generator API", default_response_class=ORJSONResponse)
+
+# Comma-separated list, e.g. "https://app.example.com,http://localhost:5173"
+CORS_ALLOW_ORIGINS = [
+    o.strip() for o in os.getenv("CORS_ALLOW_ORIGINS", "*").split(",") if o.strip()
+] or ["*"]
 
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
-    allow_methods=["*"],
+    allow_origins=CORS_ALLOW_ORIGINS,
+    allow_methods=["GET", "POST"],
     allow_headers=["*"],
 )
+class GZipExceptMiddleware:
+    """GZipMiddleware for every route except `exclude_paths` (served untouched)."""
+
+    def __init__(self, app, exclude_paths: Iterable[str] = (), **gzip_kwargs):
+        self.app = app
+        self.gzip = GZipMiddleware(app, **gzip_kwargs)
+        self.exclude_paths = frozenset(exclude_paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] in self.exclude_paths:
+            await self.app(scope, receive, send)
+        else:
+            await self.gzip(scope, receive, send)
+
+
+# Compress JSON bodies; /generate returns a zip of PDFs, which doesn't gzip
+app.add_middleware(GZipExceptMiddleware, exclude_paths={"/generate"}, minimum_size=1024)
+
+
+# =========================
+# Zip helper
+# =========================
+def write_zip(paths: Iterable[str], dest: Path) -> Path:
+    """Write `paths` into a zip at `dest`, copying each file in chunks."""
+    with zipfile.ZipFile(dest, "w") as zipf:
+        for p in paths:
+            zipf.write(p, arcname=Path(p).name)
+    return dest
+
+
+@app.on_event("startup")
+async def _warm_ocr():
+    """
+    Load (and warm up) the default EasyOCR reader in the background,
+    so startup and /healthz are not blocked by torch/easyocr imports.
+    """
+    app.state.reader_task = asyncio.create_task(run_in_threadpool(ensure_easyocr_weights, "en"))
+
+
+# =========================
+# Temp dir cleanup
+# =========================
+def _sweep_stale_tmpdirs(max_age: float = TMP_MAX_AGE) -> None:
+    """Remove request temp dirs older than `max_age` seconds."""
+    cutoff = time.time() - max_age
+    with os.scandir(tempfile.gettempdir()) as it:
+        for entry in it:
+            try:
+                if (entry.name.startswith(TMP_PREFIX) and entry.is_dir(follow_symlinks=False)
+                        and entry.stat(follow_symlinks=False).st_mtime < cutoff):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+            except OSError:
+                continue
+
+
+async def _janitor():
+    """Periodically sweep leftover temp dirs off the request path."""
+    while True:
+        try:
+            await run_in_threadpool(_sweep_stale_tmpdirs)
+        except Exception:
+            print("[WARNING] temp dir sweep failed:", traceback.format_exc())
+        await asyncio.sleep(JANITOR_INTERVAL)
+
+
+@app.on_event("startup")
+async def _start_janitor():
+    app.state.janitor_task = asyncio.create_task(_janitor())
+
+
+async def _default_reader():
+    """Return the warmed 'en' reader, or None if warm-up failed."""
+    try:
+        return await app.state.reader_task
+    except Exception:
+        return None
+
+
+# Serialized once; probes get the same immutable response on every hit
+INDEX_RESPONSE = ORJSONResponse({
+    "message": "Mock Paper Generator API is running",
+    "endpoints": ["/generate", "/healthz"],
+})
+HEALTH_RESPONSE = ORJSONResponse({"ok": True})
 
 
 @app.get("/")
-def index():
+async def index():
     """Root endpoint with API info."""
-    return {
-        "message": "Mock Paper Generator API is running",
-        "endpoints": ["/generate", "/healthz"],
-    }
+    return INDEX_RESPONSE
 
 
 @app.post("/generate")
@@ -78,14 +176,6 @@ async def generate(
     Generates cleaned text and new mock exam papers.
     Returns a zip file containing generated PDFs.
     """
-    # --- create temp dir for this request
-    tmpdir = Path(tempfile.mkdtemp(prefix="mockpaper_"))
-
-    # Save uploaded file inside temp dir
-    content = await file.read()
-    tmp_in = tmpdir / f"upload_{file.filename}"
-    tmp_in.write_bytes(content)
-
     # API key resolution (ignore Swagger’s "string")
     if openai_api_key and openai_api_key.strip().lower() != "string":
         key = openai_api_key.strip()
@@ -93,15 +183,26 @@ async def generate(
         key = (os.getenv("OPENAI_API_KEY") or "").strip()
 
     if not key:
-        return JSONResponse(
+        return ORJSONResponse(
             {"status": "error", "message": "OPENAI_API_KEY missing. Provide via .env or form."},
             status_code=400,
         )
     os.environ["OPENAI_API_KEY"] = key
 
-    # Run pipeline
+    # --- create temp dir for this request (removed once the response is sent)
+    tmpdir = Path(tempfile.mkdtemp(prefix=TMP_PREFIX))
+    cleanup = BackgroundTask(shutil.rmtree, tmpdir, ignore_errors=True)
+
+    # Save uploaded file inside temp dir (streamed in 1 MiB chunks)
+    tmp_in = tmpdir / f"upload_{file.filename}"
+    async with aiofiles.open(tmp_in, "wb") as f:
+        while chunk := await file.read(UPLOAD_CHUNK_SIZE):
+            await f.write(chunk)
+
+    # Run pipeline (blocking OCR + LLM work → threadpool, keeps the event loop free)
     try:
-        pdf_paths, concat_txt_path, out_dir = run_pipeline_end_to_end(
+        pdf_paths, concat_txt_path, out_dir = await run_in_threadpool(
+            run_pipeline_end_to_end,
             files=[tmp_in],
             language=language,
             dpi=dpi,
@@ -110,31 +211,30 @@ async def generate(
             num_mocks=num_mocks,
             difficulty=difficulty,
             out_dir=str(tmpdir),
+            reader=await _default_reader() if language == "en" else None,
         )
     except Exception as e:
         print("----- PIPELINE ERROR -----")
         print(traceback.format_exc())
         print("--------------------------")
+        await cleanup()
         raise HTTPException(status_code=500, detail=f"Pipeline error: {e}")
 
     if not pdf_paths:
+        await cleanup()
         raise HTTPException(status_code=500, detail="Generation failed: no PDFs produced")
 
-    # --- Bundle all generated PDFs into a zip
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w") as zipf:
-        for p in pdf_paths:
-            zipf.write(p, arcname=Path(p).name)
-    zip_buffer.seek(0)
-
-    return StreamingResponse(
-        zip_buffer,
+    # --- Zip all generated PDFs next to them and serve the file directly
+    zip_path = await run_in_threadpool(write_zip, pdf_paths, tmpdir / "mockpapers.zip")
+    return FileResponse(
+        zip_path,
         media_type="application/zip",
-        headers={"Content-Disposition": "attachment; filename=mockpapers.zip"},
+        filename="mockpapers.zip",
+        background=cleanup,
     )
 
 
 @app.get("/healthz")
-def healthz():
+async def healthz():
     """Health check endpoint."""
-    return {"ok": True}
+    return HEALTH_RESPONSE
@@ -1,39 +1,56 @@
 # core/__init__.py
+"""
+Lazy re-exports (PEP 562): each submodule is imported on first access,
+so importing `src.core` does not pull in OCR/LLM/PDF dependencies.
+"""
 
-# ---- Rendering (PDF/DOCX → PNG for OCR) ----
-from .render import (
-    pdf_to_png,
-    docx_to_pdf,
-    render_paper_to_images,
-)
+import importlib
 
-# ---- Upload / OCR text extraction ----
-from .mock_upload import (
-    papers_to_clean_text,
-)
-
-# ---- LLM mock paper generation ----
-from .llm_mockgen import (
-    configure_openai,
-    generate_mock_papers,
-)
-
-# ---- PDF export (exam paper + answers) ----
-from .mock_export import build_mockpaper_pdf
-
-# ---- Orchestration pipeline ----
-from .pipeline import run_pipeline_end_to_end
+_EXPORTS = {
+    # ---- Rendering (PDF/DOCX → PNG for OCR) ----
+    "pdf_to_png": ".render",
+    "pdf_to_arrays": ".render",
+    "docx_to_pdf": ".render",
+    "render_paper_to_images": ".render",
+    # ---- Upload / OCR text extraction ----
+    "papers_to_clean_text": ".mock_upload",
+    # ---- LLM mock paper generation ----
+    "configure_openai": ".llm_mockgen",
+    "generate_mock_papers": ".llm_mockgen",
+    "agenerate_mock_papers": ".llm_mockgen",
+    "agenerate_mock_papers_many": ".llm_mockgen",
+    "aiter_mock_papers": ".llm_mockgen",
+    # ---- PDF export (exam paper + answers) ----
+    "build_mockpaper_pdf": ".mock_export",
+    "build_mockpapers_pdf_batch": ".mock_export",
+    # ---- Orchestration pipeline ----
+    "run_pipeline_end_to_end": ".pipeline",
+}
 
 
 __all__ = [
     # render
-    "pdf_to_png", "docx_to_pdf", "render_paper_to_images",
+    "pdf_to_png", "pdf_to_arrays", "docx_to_pdf", "render_paper_to_images",
     # upload / ocr
     "papers_to_clean_text",
     # llm mockgen
-    "configure_openai", "generate_mock_papers",
+    "configure_openai", "generate_mock_papers", "agenerate_mock_papers",
+    "agenerate_mock_papers_many", "aiter_mock_papers",
     # pdf export
-    "build_mockpaper_pdf",
+    "build_mockpaper_pdf", "build_mockpapers_pdf_batch",
     # pipeline
     "run_pipeline_end_to_end",
 ]
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module, __name__), name)
+    globals()[name] = value  # cache: later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
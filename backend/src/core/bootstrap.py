@@ -1,19 +1,26 @@
 # backend/src/core/bootstrap.py
 import os
+import functools
 from pathlib import Path
-import easyocr
 
 # Paths
 EASYOCR_MODELS = Path(__file__).resolve().parent.parent / "models" / "easyocr"
 EASYOCR_CACHE = Path("/tmp/.easyocr_cache")
 
+@functools.lru_cache(maxsize=4)
 def ensure_easyocr_weights(lang: str = "en"):
     """
     Initialize EasyOCR, forcing cache to /tmp to avoid permission errors.
+    Memoized per language so the weights are loaded once per process.
+    easyocr (and torch) are imported here, not at module import time.
     """
-    # Ensure directories exist
-    EASYOCR_MODELS.mkdir(parents=True, exist_ok=True)
-    EASYOCR_CACHE.mkdir(parents=True, exist_ok=True)
+    import easyocr
+    import numpy as np
+
+    # Ensure directories exist (skip the syscall when they already do)
+    for d in (EASYOCR_MODELS, EASYOCR_CACHE):
+        if not d.exists():
+            d.mkdir(parents=True, exist_ok=True)
 
     print("[BOOTSTRAP] ensure_easyocr_weights() CALLED")
     print(f"[BOOTSTRAP] model dir: {EASYOCR_MODELS}")
@@ -28,5 +35,8 @@ def ensure_easyocr_weights(lang: str = "en"):
         gpu=False,
     )
 
+    # Warm-up pass so backend kernels are tuned before the first real page
+    reader.readtext_batched(np.zeros((2, 64, 64, 3), dtype=np.uint8))
+
     print("[BOOTSTRAP] EasyOCR reader initialized with /tmp cache")
     return reader
@@ -0,0 +1,121 @@
+# backend/src/core/llm_cache.py
+# -*- coding: utf-8 -*-
+"""
+Content-addressed cache for raw LLM completions.
+
+- Key = sha256 over (model, messages, temperature, response_format).
+- Backend = diskcache on local disk, with a TTL per entry.
+- Enabled with LLM_CACHE_ENABLED=1 (and diskcache installed); otherwise
+  every call goes straight to the API.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Protocol
+
+try:
+    import diskcache  # type: ignore
+    _HAS_DISKCACHE = True
+except Exception:  # pragma: no cover
+    _HAS_DISKCACHE = False
+
+LLM_CACHE_DIR = os.getenv("LLM_CACHE_DIR", "/tmp/llmcache")
+LLM_CACHE_TTL = 7 * 24 * 3600  # seconds
+
+
+# =========================
+# Backends
+# =========================
+class CacheBackend(Protocol):
+    def get(self, key: str) -> Optional[Any]: ...
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None: ...
+
+
+class DiskCacheBackend:
+    """CacheBackend on top of diskcache.Cache (process- and thread-safe)."""
+
+    def __init__(self, path: str):
+        if not _HAS_DISKCACHE:
+            raise RuntimeError("diskcache is not installed")
+        self._cache = diskcache.Cache(path)
+
+    def get(self, key: str) -> Optional[Any]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        self._cache.set(key, value, expire=ttl)
+
+
+_LLM_CACHE: Optional[CacheBackend] = None
+
+
+def llm_cache_enabled() -> bool:
+    return _HAS_DISKCACHE and os.getenv("LLM_CACHE_ENABLED") == "1"
+
+
+def get_llm_cache() -> Optional[CacheBackend]:
+    """Shared completion cache, or None when caching is disabled."""
+    global _LLM_CACHE
+    if not llm_cache_enabled():
+        return None
+    if _LLM_CACHE is None:
+        _LLM_CACHE = DiskCacheBackend(LLM_CACHE_DIR)
+    return _LLM_CACHE
+
+
+# =========================
+# Completions
+# =========================
+def completion_cache_key(
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]] = None,
+) -> str:
+    payload = {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "response_format": response_format,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def cached_completion(
+    client: Any,
+    model: str,
+    messages: List[Dict[str, str]],
+    temperature: float,
+    response_format: Optional[Dict[str, Any]] = None,
+    ttl: int = LLM_CACHE_TTL,
+) -> str:
+    """
+    Return the stripped content of one chat completion, served from the
+    cache when an identical request was made before.
+    """
+    cache = get_llm_cache()
+    key = completion_cache_key(model, messages, temperature, response_format) if cache else None
+    if key:
+        hit = cache.get(key)
+        if hit is not None:
+            return hit
+
+    kwargs: Dict[str, Any] = {"model": model, "messages": messages, "temperature": temperature}
+    if response_format is not None:
+        kwargs["response_format"] = response_format
+    resp = await client.chat.completions.create(**kwargs)
+    raw = resp.choices[0].message.content.strip() if resp.choices else ""
+
+    # Report OpenAI prompt-cache reuse (prefix tokens billed at the cached rate)
+    usage = getattr(resp, "usage", None)
+    cached_tokens = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", None)
+    if cached_tokens is not None:
+        print(f"[DEBUG] LLM prompt tokens: {usage.prompt_tokens} (cached: {cached_tokens})")
+
+    if key and raw:
+        cache.set(key, raw, ttl=ttl)
+    return raw
@@ -18,14 +18,33 @@ Enhancements:
 
 from __future__ import annotations
 
+import asyncio
+import concurrent.futures
+import contextlib
+import hashlib
 import json
 import os
 import re
+import threading
 import unicodedata
-from typing import Any, Dict, List, Optional, Tuple
+import weakref
+from typing import TYPE_CHECKING, Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from openai import OpenAI
-from pydantic import BaseModel, Field, RootModel, field_validator
+from pydantic import BaseModel, Field, RootModel, field_validator, model_validator
+
+try:
+    import orjson  # type: ignore
+    _json_loads = orjson.loads
+except Exception:  # pragma: no cover
+    _json_loads = json.loads
+
+from .llm_cache import _HAS_DISKCACHE, CacheBackend, DiskCacheBackend, cached_completion
+from .semantic_cache import SemanticIndex, semantic_threshold
+
+# openai (~350 ms) is imported on first client creation, so importers that only
+# need the text helpers (pdf_builder, its spawned workers) don't pay for it
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
 
 OPENAI_DEFAULT_MODEL = "gpt-4o-mini"
 
@@ -33,18 +52,68 @@ OPENAI_DEFAULT_MODEL = "gpt-4o-mini"
 # ============================================================
 # OpenAI configuration
 # ============================================================
-def configure_openai(api_key: Optional[str] = None) -> OpenAI:
+def _resolve_api_key(api_key: Optional[str] = None) -> str:
     key = (api_key or os.environ.get("OPENAI_API_KEY") or "").strip()
     if not key:
         raise RuntimeError(
             "OpenAI API key not found. Set OPENAI_API_KEY or pass api_key=..."
         )
-    return OpenAI(api_key=key)
+    return key
+
+
+def configure_openai(api_key: Optional[str] = None) -> OpenAI:
+    # Sync client for external callers; generation itself uses AsyncOpenAI
+    from openai import OpenAI
+
+    return OpenAI(api_key=_resolve_api_key(api_key))
+
+
+def configure_openai_async(api_key: Optional[str] = None) -> AsyncOpenAI:
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=_resolve_api_key(api_key))
+
+
+# Max in-flight completions per event loop (rate-limit friendly)
+LLM_CONCURRENCY = int(os.getenv("MOCKGEN_LLM_CONCURRENCY", "3"))
+_LLM_SEMAPHORES: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _llm_semaphore() -> asyncio.Semaphore:
+    """Semaphore bounding concurrent LLM calls on the running loop."""
+    loop = asyncio.get_running_loop()
+    sem = _LLM_SEMAPHORES.get(loop)
+    if sem is None:
+        sem = _LLM_SEMAPHORES[loop] = asyncio.Semaphore(max(1, LLM_CONCURRENCY))
+    return sem
+
+
+@contextlib.asynccontextmanager
+async def _async_client(api_key: Optional[str], client: Optional[AsyncOpenAI]):
+    """Yield the caller's client as-is, or a fresh one closed on exit."""
+    if client is not None:
+        yield client
+        return
+    async with configure_openai_async(api_key) as own:
+        yield own
 
 
 # ============================================================
 # Unicode cleanup → font-safe
 # ============================================================
+_U_ESC_RE = re.compile(r"U\+([0-9A-Fa-f]{4,6})")
+
+
+def _decode_escape(m: re.Match) -> str:
+    try:
+        codepoint = int(m.group(1), 16)
+        return chr(codepoint)
+    except Exception:
+        return m.group(0)
+
+
 def decode_unicode_escapes(text: str) -> str:
     """
     Decode sequences like 'U+03C0' into real Unicode characters.
@@ -52,15 +121,49 @@ def decode_unicode_escapes(text: str) -> str:
     """
     if not text:
         return text
+    return _U_ESC_RE.sub(_decode_escape, text)
 
-    def repl(m):
-        try:
-            codepoint = int(m.group(1), 16)
-            return chr(codepoint)
-        except Exception:
-            return m.group(0)
 
-    return re.sub(r"U\+([0-9A-Fa-f]{4,6})", repl, text)
+_FONT_SAFE_REPLACEMENTS = {
+    # multiplication/division
+    "·": "*", "×": "*", "÷": "/", "⁄": "/",
+    # dashes
+    "–": "-", "−": "-", "—": "-",
+    # greek
+    "π": "π", "θ": "θ", "α": "α", "β": "β", "Δ": "Δ", "δ": "δ",
+    # math ops
+    "√": "√", "∑": "∑", "∫": "∫", "∞": "∞",
+    # junk blocks
+    "■": "*", "▮": "*", "█": "*", "▪": "*", "▫": "*",
+    "◼": "*", "◾": "*", "◽": "*",
+}
+
+
+class _FontSafeTable(dict):
+    """
+    str.translate table for normalize_unicode_math.
+    Seeded with the explicit replacements; every other code point is
+    classified on first sight and cached, so translate stays in C.
+    """
+
+    def __missing__(self, cp: int):
+        ch = chr(cp)
+        if unicodedata.combining(ch):
+            value = None  # strip combining marks
+        elif (
+            32 <= cp < 127                 # printable ASCII
+            or 0x2200 <= cp <= 0x22FF      # Math operators block
+            or 0x03B1 <= cp <= 0x03C9      # Greek lowercase
+            or 0x0391 <= cp <= 0x03A9      # Greek uppercase
+        ):
+            value = cp
+        else:
+            value = "*"  # safe fallback
+        self[cp] = value
+        return value
+
+
+_FONT_SAFE_TABLE = _FontSafeTable({ord(k): v for k, v in _FONT_SAFE_REPLACEMENTS.items()})
 
 
 def normalize_unicode_math(text: str) -> str:
@@ -74,43 +177,12 @@ def normalize_unicode_math(text: str) -> str:
     """
     if not text:
         return text
+    # Printable ASCII with no escapes maps to itself (NFKD and table alike)
+    if text.isascii() and text.isprintable() and "U+" not in text:
+        return text
 
     text = decode_unicode_escapes(text)
-    norm = unicodedata.normalize("NFKD", text)
-    out_chars = []
-
-    replacements = {
-        # multiplication/division
-        "·": "*", "×": "*", "÷": "/", "⁄": "/",
-        # dashes
-        "–": "-", "−": "-", "—": "-",
-        # greek
-        "π": "π", "θ": "θ", "α": "α", "β": "β", "Δ": "Δ", "δ": "δ",
-        # math ops
-        "√": "√", "∑": "∑", "∫": "∫", "∞": "∞",
-        # junk blocks
-        "■": "*", "▮": "*", "█": "*", "▪": "*", "▫": "*",
-        "◼": "*", "◾": "*", "◽": "*",
-    }
-
-    for ch in norm:
-        if unicodedata.combining(ch):
-            continue
-        if ch in replacements:
-            out_chars.append(replacements[ch])
-        else:
-            if 32 <= ord(ch) < 127:
-                out_chars.append(ch)  # printable ASCII
-            elif 0x2200 <= ord(ch) <= 0x22FF:
-                out_chars.append(ch)  # Math operators block
-            elif 0x03B1 <= ord(ch) <= 0x03C9:
-                out_chars.append(ch)  # Greek lowercase
-            elif 0x0391 <= ord(ch) <= 0x03A9:
-                out_chars.append(ch)  # Greek uppercase
-            else:
-                out_chars.append("*")  # safe fallback
-
-    return "".join(out_chars)
+    return unicodedata.normalize("NFKD", text).translate(_FONT_SAFE_TABLE)
 
 
 # ============================================================
@@ -160,20 +232,14 @@ class MockSpec(BaseModel):
     def _qid_set(self) -> set[str]:
         return {q.id for s in self.sections for q in s.questions}
 
-    @field_validator("answer_key")
-    def _answers_refer_to_existing_qids(cls, v, values):
-        qids = set()
-        try:
-            sections = values.get("sections") or []
-            for s in sections:
-                for q in s.questions:
-                    qids.add(q.id)
-        except Exception:
-            pass
-        if qids and v:
-            keep = [a for a in v if a.id in qids]
-            return keep
-        return v
+    @model_validator(mode="after")
+    def _answers_refer_to_existing_qids(self):
+        # Runs once on the built model: one pass for the qid set, one filter
+        if self.answer_key:
+            qids = self._qid_set()
+            if qids:
+                self.answer_key = [a for a in self.answer_key if a.id in qids]
+        return self
 
 
 class MockSet(RootModel):
@@ -187,6 +253,14 @@ class MockSet(RootModel):
 # ============================================================
 # Prompting
 # ============================================================
+REFERENCE_TEXT_LIMIT = 60000  # chars of the reference paper sent to the model
+
+
+def _clip_reference(text: str) -> str:
+    """Trim the reference to REFERENCE_TEXT_LIMIT chars (returns `text` itself when it fits)."""
+    return text[:REFERENCE_TEXT_LIMIT]
+
+
 MOCKPAPER_SYSTEM = (
     "You are an expert university exam paper generator and formatter. "
     "You output STRICT JSON for each mock exam. "
@@ -207,14 +281,27 @@ def _difficulty_guidance(difficulty: str) -> str:
     return f"Adjust difficulty: {difficulty}."
 
 
-def build_structured_prompt(paper_text: str, difficulty: str, num_mocks: int) -> str:
+def build_structured_prompt(
+    paper_text: str,
+    difficulty: str,
+    num_mocks: int,
+    variant: int = 1,
+    num_variants: int = 1,
+) -> str:
     """
     Structured JSON spec.
     - Preserve whether a question is free-response or MCQ.
     - MCQ: exactly 4 options (a.–d.) only if present in reference.
     - Free-response: no options, only text.
     - Math must remain plain ASCII-safe (x^2, H2O, pi, theta).
+    - `variant`/`num_variants` mark one of several independently generated mocks.
     """
+    # Goes last: everything before it is shared by all variants (prompt-cache prefix)
+    variant_note = (
+        f"\nVariant:\n- This request is variant {variant} of {num_variants} generated independently: "
+        "choose fresh contexts, numbers and wording so it differs from the other variants."
+        if num_variants > 1 else ""
+    )
     return f"""
 You must return a single JSON object of the form:
 
@@ -286,154 +373,224 @@ Difficulty:
 {_difficulty_guidance(difficulty)}
 
 Reference exam (<=60k chars; trimmed if longer):
-{paper_text[:60000]}
-""".strip()
+{_clip_reference(paper_text)}
+{variant_note}""".strip()
 
 
 # ============================================================
 # Helpers for JSON extraction
 # ============================================================
-_JSON_OBJECT_RE = re.compile(r"\{.*\}", re.S)
+_FENCE_LANG_CHARS = "abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_TRAILING_COMMA_RE = re.compile(r",\s*([}\]])")
 
 
 def _extract_json(s: str) -> str:
     s2 = s.strip()
     if s2.startswith("```"):
-        s2 = re.sub(r"^```[a-zA-Z]*\n?", "", s2)
+        # drop the opening fence and its language tag, e.g. "```json\n"
+        s2 = s2[3:].lstrip(_FENCE_LANG_CHARS)
+        if s2.startswith("\n"):
+            s2 = s2[1:]
         s2 = s2.rstrip("`").rstrip()
-    m = _JSON_OBJECT_RE.search(s2)
-    if m:
-        return m.group(0)
+    # first "{" .. last "}" — plain scans instead of a greedy DOTALL regex
+    i = s2.find("{")
+    j = s2.rfind("}")
+    if i != -1 and j > i:
+        return s2[i:j + 1]
     return s2
 
 
 def _json_loads_safe(s: str) -> Dict[str, Any]:
     try:
-        return json.loads(s)
+        return _json_loads(s)
     except Exception:
         # Best-effort trailing comma cleanup
-        s2 = re.sub(r",\s*([}\]])", r"\1", s)
-        return json.loads(s2)
+        s2 = _TRAILING_COMMA_RE.sub(r"\1", s)
+        return _json_loads(s2)
 
 
 # ============================================================
 # Post-parse ensure: complete answer key
 # ============================================================
+_MCQ_LETTER_RE = re.compile(r"^\(?([abcd])\)?\.?$")
+_MCQ_DIGIT_RE = re.compile(r"^\(?([1-4])\)?\.?$")
+
+# Every common spelling of an MCQ label → "a".."d". Bare numbers are 0-based
+# first (later entries overwrite earlier ones, so 1 → "b" and 4 → "d"), while
+# decorated ones ("(1)", "1.") are 1-based, matching the regex fallbacks below.
+_LABEL_MAP: Dict[Any, str] = {}
+for _i, _ch in enumerate("abcd"):
+    for _k in (_i, _i + 1, str(_i), str(_i + 1), _ch, f"({_ch})", f"{_ch}.", f"{_ch})",
+               f"({_i + 1})", f"{_i + 1}.", f"{_i + 1})"):
+        _LABEL_MAP[_k] = _ch
+del _i, _ch, _k
+
+
 def _normalize_mcq_correct_label(correct: Any) -> Optional[str]:
     if correct is None:
         return None
     if isinstance(correct, int):
-        if 0 <= correct <= 3:
-            return "abcd"[correct]
-        if 1 <= correct <= 4:
-            return "abcd"[correct - 1]
-        return None
+        return _LABEL_MAP.get(correct)
     c = str(correct).strip().lower()
-    if c in {"a", "b", "c", "d"}:
-        return c
+    lab = _LABEL_MAP.get(c)
+    if lab is not None:
+        return lab
     if c.isdigit():
         n = int(c)
         if 0 <= n <= 3:
             return "abcd"[n]
         if 1 <= n <= 4:
             return "abcd"[n - 1]
-    m = re.match(r"^\(?([abcd])\)?\.?$", c)
+    m = _MCQ_LETTER_RE.match(c)
     if m:
         return m.group(1)
-    m = re.match(r"^\(?([1-4])\)?\.?$", c)
+    m = _MCQ_DIGIT_RE.match(c)
     if m:
         return "abcd"[int(m.group(1)) - 1]
     return None
 
 
+_WORKINGS_MCQ_MISSING = (
+    "Step-by-step reasoning not provided by model; include elimination of each option and the confirming calculation."
+)
+_WORKINGS_MCQ_LABEL = (
+    "Step-by-step reasoning not provided by model; explain why this option is correct and others are not."
+)
+_WORKINGS_FREE_MISSING = (
+    "Step-by-step solution not provided by model; include: GIVEN/GOAL, PLAN, numbered derivation, "
+    "substitutions with intermediate values, simplifications, units, verification, pitfalls."
+)
+
+
+def _placeholder_answer(q: Question) -> AnswerItem:
+    """Answer-key entry for a question the model left out."""
+    if q.options:
+        lab = _normalize_mcq_correct_label(q.correct)
+        answer, workings = (
+            ("[missing]", _WORKINGS_MCQ_MISSING) if lab is None else (lab, _WORKINGS_MCQ_LABEL)
+        )
+    else:
+        answer, workings = "[missing]", _WORKINGS_FREE_MISSING
+    # Fields are plain strings we control, so skip validation
+    return AnswerItem.model_construct(id=q.id, answer=answer, workings=workings)
+
+
 def _ensure_complete_answer_key(m: MockSpec) -> None:
     existing = {a.id for a in m.answer_key}
-    ak = list(m.answer_key)
+    new_items: List[AnswerItem] = []
 
     for sec in m.sections:
         for q in sec.questions:
             if q.id in existing:
                 continue
-            if q.options:
-                lab = _normalize_mcq_correct_label(q.correct)
-                if lab is None:
-                    ak.append(
-                        AnswerItem(
-                            id=q.id,
-                            answer="[missing]",
-                            workings="Step-by-step reasoning not provided by model; include elimination of each option and the confirming calculation."
-                        )
-                    )
-                else:
-                    ak.append(
-                        AnswerItem(
-                            id=q.id,
-                            answer=lab,
-                            workings="Step-by-step reasoning not provided by model; explain why this option is correct and others are not."
-                        )
-                    )
-            else:
-                ak.append(
-                    AnswerItem(
-                        id=q.id,
-                        answer="[missing]",
-                        workings=("Step-by-step solution not provided by model; include: GIVEN/GOAL, PLAN, numbered derivation, "
-                                  "substitutions with intermediate values, simplifications, units, verification, pitfalls.")
-                    )
-                )
+            new_items.append(_placeholder_answer(q))
             existing.add(q.id)
 
-    m.answer_key = ak
+    m.answer_key.extend(new_items)
 
 
 # ============================================================
 # Public: Structured generation
 # ============================================================
-def generate_mock_specs(
+async def _agenerate_one_spec(
+    client: AsyncOpenAI,
+    paper_text: str,
+    difficulty: str,
+    model_name: str,
+    variant: int,
+    num_variants: int,
+) -> Optional[MockSpec]:
+    """One structured completion for a single mock; None if the model returned none."""
+    prompt = build_structured_prompt(
+        paper_text, difficulty, 1, variant=variant, num_variants=num_variants
+    )
+    async with _llm_semaphore():
+        raw = await cached_completion(
+            client,
+            model=model_name,
+            messages=[
+                {"role": "system", "content": MOCKPAPER_SYSTEM},
+                {"role": "user", "content": prompt},
+            ],
+            temperature=0.7,
+            response_format={"type": "json_object"},
+        ) or "{}"
+    payload = _json_loads_safe(_extract_json(raw))
+    if not isinstance(payload, dict):
+        raise ValueError("structured response is not a JSON object")
+    # Only the first mock is used, so only it goes through full validation
+    mocks = payload.get("mocks") or []
+    return MockSpec.model_validate(mocks[0]) if mocks else None
+
+
+def _empty_mock_spec() -> MockSpec:
+    """Known-trivial placeholder mock, built without running validators."""
+    return MockSpec.model_construct(
+        title="Mock Exam Paper",
+        instructions=None,
+        sections=[Section.model_construct(title="Section 1", questions=[])],
+        answer_key=[],
+        assets=[],
+    )
+
+
+async def _agenerate_mock_specs_typed(
+    paper_text: str,
+    difficulty: str,
+    num_mocks: int,
+    model_name: str,
+    api_key: Optional[str],
+    client: Optional[AsyncOpenAI] = None,
+) -> List[MockSpec]:
+    """
+    Structured generation with one request per mock, issued concurrently
+    (wall-clock ≈ slowest single mock instead of one long completion).
+    Pass `client` to share one connection pool across calls.
+    """
+    # Cap to 3 like before (unchanged behavior)
+    num_mocks = max(1, min(num_mocks, 3))
+    async with _async_client(api_key, client) as client:
+        results = await asyncio.gather(*[
+            _agenerate_one_spec(client, paper_text, difficulty, model_name, i, num_mocks)
+            for i in range(1, num_mocks + 1)
+        ])
+
+    # Answer keys are completed by the caller (on dump, or while rendering)
+    return [_empty_mock_spec() if m is None else m for m in results]
+
+
+async def agenerate_mock_specs(
     paper_text: str,
     difficulty: str = "same",
     num_mocks: int = 1,
     model_name: str = OPENAI_DEFAULT_MODEL,
     api_key: Optional[str] = None,
+    client: Optional[AsyncOpenAI] = None,
 ) -> List[Dict[str, Any]]:
-    # Cap to 3 like before (unchanged behavior)
-    num_mocks = max(1, min(num_mocks, 3))
-    client = configure_openai(api_key)
-    prompt = build_structured_prompt(paper_text, difficulty, num_mocks)
-
-    resp = client.chat_completions.create(  # type: ignore[attr-defined]
-        model=model_name,
-        messages=[
-            {"role": "system", "content": MOCKPAPER_SYSTEM},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.7,
-        response_format={"type": "json_object"},
-    ) if hasattr(client, "chat_completions") else client.chat.completions.create(
-        model=model_name,
-        messages=[
-            {"role": "system", "content": MOCKPAPER_SYSTEM},
-            {"role": "user", "content": prompt},
-        ],
-        temperature=0.7,
-        response_format={"type": "json_object"},
+    """Structured mocks as plain dicts (see _agenerate_mock_specs_typed)."""
+    mocks = await _agenerate_mock_specs_typed(
+        paper_text, difficulty, num_mocks, model_name, api_key, client=client
     )
-
-    raw = resp.choices[0].message.content.strip() if resp.choices else "{}"
-    payload = _json_loads_safe(_extract_json(raw))
-    mockset = MockSet.model_validate(payload)
-
-    mocks = list(mockset.mocks)
     for m in mocks:
         _ensure_complete_answer_key(m)
+    return [m.model_dump() for m in mocks]
 
-    if len(mocks) < num_mocks:
-        while len(mocks) < num_mocks:
-            empty = MockSpec(sections=[Section(title="Section 1", questions=[])], answer_key=[])
-            _ensure_complete_answer_key(empty)
-            mocks.append(empty)
 
-    return [m.model_dump() for m in mocks[:num_mocks]]
+def generate_mock_specs(
+    paper_text: str,
+    difficulty: str = "same",
+    num_mocks: int = 1,
+    model_name: str = OPENAI_DEFAULT_MODEL,
+    api_key: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Sync wrapper for agenerate_mock_specs (call from a thread without a running loop)."""
+    return asyncio.run(agenerate_mock_specs(
+        paper_text=paper_text,
+        difficulty=difficulty,
+        num_mocks=num_mocks,
+        model_name=model_name,
+        api_key=api_key,
+    ))
 
 
 # ============================================================
@@ -449,10 +606,7 @@ LEGACY_SYSTEM = (
 )
 
 
-def _build_legacy_prompt(paper_text: str, difficulty: str, num_mocks: int) -> str:
-    return f"""
-{LEGACY_SYSTEM}
-
+LEGACY_CONSTRAINTS = """
 Constraints:
 - For EACH mock, produce a FULL, STANDALONE paper. Do NOT partition or split the reference across mocks.
 - Match the number of SECTIONS and number of QUESTIONS per section to the reference (never fewer).
@@ -467,124 +621,175 @@ Constraints:
 - Do NOT include answers inside questions.
 - Do NOT use Markdown tables. Use pipe-delimited plain text if needed (e.g. "|col1|col2|").
 
-Difficulty:
-{_difficulty_guidance(difficulty)}
-
 Output format (STRICT):
-For each of {num_mocks} mock exams:
+For each mock exam:
 ### MOCK PAPER X
 <full paper with sections and questions>
 ### ANSWER KEY X
 <answers covering EVERY question with step-by-step workings>
-
-Reference exam (<=60k chars; trimmed if longer):
-{paper_text[:60000]}
 """.strip()
 
 
+def _build_legacy_messages(paper_text: str, difficulty: str, num_mocks: int) -> List[Dict[str, str]]:
+    """
+    Static instructions first (system turn), then reference + mock count.
+    Identical leading tokens across calls let OpenAI's prompt cache reuse
+    the prefix, so keep this ordering stable.
+    """
+    system = f"{LEGACY_SYSTEM}\n\n{LEGACY_CONSTRAINTS}\n\nDifficulty:\n{_difficulty_guidance(difficulty)}"
+    user = (
+        f"Reference exam (<=60k chars; trimmed if longer):\n{_clip_reference(paper_text)}\n\n"
+        f"Generate {num_mocks} mock exams in the specified format."
+    )
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": user},
+    ]
+
+
 # ============================================================
 # Renderer: Convert spec → text
 # ============================================================
-def _render_spec_to_text(spec: Dict[str, Any]) -> Tuple[str, str]:
-    m = MockSpec.model_validate(spec)
+_ANSWER_TAIL_RE = re.compile(r"(Answer\s*:.*|Correct\s*:.*)$", re.I)
 
+
+def _finalize_and_render(m: MockSpec) -> Tuple[str, str]:
+    """
+    Render (paper_text, answer_key_text) and complete the answer key in the
+    same walk over the questions (equivalent to _ensure_complete_answer_key
+    followed by rendering).
+    """
+    norm = normalize_unicode_math
+    existing = {a.id for a in m.answer_key}
+    missing: List[AnswerItem] = []
     paper_lines: List[str] = []
+    add = paper_lines.extend
     if m.title:
-        paper_lines.append(normalize_unicode_math(m.title))
-        paper_lines.append("")
+        add((norm(m.title), ""))
     if m.instructions:
-        paper_lines.append(normalize_unicode_math(m.instructions))
-        paper_lines.append("")
+        add((norm(m.instructions), ""))
 
     for s_idx, sec in enumerate(m.sections, start=1):
-        paper_lines.append(normalize_unicode_math(f"{s_idx}. {sec.title}"))
+        paper_lines.append(norm(f"{s_idx}. {sec.title}"))
         for q in sec.questions:
             marks_str = f" ({q.marks} marks)" if q.marks else ""
-            q_text = normalize_unicode_math(f"{q.id}. {q.text}{marks_str}")
+            q_text = norm(f"{q.id}. {q.text}{marks_str}")
             # strip any accidental answer text inside the question body
-            q_text = re.sub(r"(Answer\s*:.*|Correct\s*:.*)$", "", q_text, flags=re.I).strip()
-            paper_lines.append(q_text)
+            # (the pattern needs a ":", so skip the regex when there is none)
+            if ":" in q_text:
+                q_text = _ANSWER_TAIL_RE.sub("", q_text)
+            paper_lines.append(q_text.strip())
             if q.options:
-                for opt in q.options[:4]:
-                    paper_lines.append(normalize_unicode_math(opt))
+                add(map(norm, q.options[:4]))
             paper_lines.append("")
+            if q.id not in existing:
+                missing.append(_placeholder_answer(q))
+                existing.add(q.id)
         paper_lines.append("")
+    m.answer_key.extend(missing)
 
-    ans_lines: List[str] = []
-    ans_lines.append("Answer Key")
+    ans_lines: List[str] = ["Answer Key"]
     for a in m.answer_key:
-        ans_lines.append(f"{a.id}: {normalize_unicode_math(a.answer)}")
         if a.workings:
-            ans_lines.append(normalize_unicode_math(a.workings))
-        ans_lines.append("")
+            ans_lines.extend((f"{a.id}: {norm(a.answer)}", norm(a.workings), ""))
+        else:
+            ans_lines.extend((f"{a.id}: {norm(a.answer)}", ""))
 
     return "\n".join(paper_lines).strip(), "\n".join(ans_lines).strip()
 
 
+# ============================================================
+# Response cache (opt-in via MOCKGEN_CACHE=1)
+# ============================================================
+MOCKGEN_CACHE_DIR = os.getenv("MOCKGEN_CACHE_DIR", "/tmp/mockcache")
+_RESPONSE_CACHE: Optional[CacheBackend] = None
+_SEMANTIC_INDEX: Optional[SemanticIndex] = None
+
+
+def _cache_enabled() -> bool:
+    return _HAS_DISKCACHE and os.getenv("MOCKGEN_CACHE") == "1"
+
+
+def _response_cache() -> CacheBackend:
+    global _RESPONSE_CACHE
+    if _RESPONSE_CACHE is None:
+        _RESPONSE_CACHE = DiskCacheBackend(MOCKGEN_CACHE_DIR)
+    return _RESPONSE_CACHE
+
+
+def _semantic_index() -> SemanticIndex:
+    global _SEMANTIC_INDEX
+    if _SEMANTIC_INDEX is None:
+        _SEMANTIC_INDEX = SemanticIndex(MOCKGEN_CACHE_DIR)
+    return _SEMANTIC_INDEX
+
+
+_WS_RUN_RE = re.compile(r"\s+")
+
+
+def _normalize_for_cache(text: str) -> str:
+    """
+    Canonical form of the reference for cache keys only: NFKC and whitespace
+    runs → one space. Re-extracting the same PDF with different line breaks
+    or OCR spacing then maps to the same entry. Every character the model
+    sees is kept (no font-safe folding, which maps all non-Latin text to
+    "*"); case is kept too, it is meaningful in math.
+    """
+    text = unicodedata.normalize("NFKC", _clip_reference(text))
+    return _WS_RUN_RE.sub(" ", text).strip()
+
+
+def _mock_cache_key(paper_text: str, model_name: str, difficulty: str, num_mocks: int) -> str:
+    """Content-addressed key over the (normalized) reference text and generation knobs."""
+    h = hashlib.blake2b(digest_size=20)
+    h.update(_normalize_for_cache(paper_text).encode("utf-8"))
+    # "v4": keys no longer fold symbols (v3 keys could collide across scripts)
+    h.update(f"|{model_name}|{difficulty}|{num_mocks}|v4".encode("utf-8"))
+    return h.hexdigest()
+
+
 # ============================================================
 # Public wrapper
 # ============================================================
-def generate_mock_papers(
+async def _alegacy_generate_mock_papers(
     paper_text: str,
-    difficulty: str = "same",
-    num_mocks: int = 1,
-    model_name: str = OPENAI_DEFAULT_MODEL,
-    api_key: Optional[str] = None,
+    difficulty: str,
+    num_mocks: int,
+    model_name: str,
+    api_key: Optional[str],
+    client: Optional[AsyncOpenAI] = None,
 ) -> List[Tuple[str, str]]:
-    """
-    Returns a list of (paper_text, answer_key_text) tuples.
-    Structured path first; if it fails, use legacy text format with
-    improved pairing logic to avoid question splitting across mocks.
-    """
-    try:
-        specs = generate_mock_specs(
-            paper_text=paper_text,
-            difficulty=difficulty,
-            num_mocks=num_mocks,
-            model_name=model_name,
-            api_key=api_key,
-        )
-        return [_render_spec_to_text(spec) for spec in specs]
-    except Exception:
-        # Legacy fallback (text parsing)
-        client = configure_openai(api_key)
-        prompt = _build_legacy_prompt(paper_text, difficulty, num_mocks)
+    """Legacy fallback: plain-text completion parsed into (paper, answers) pairs."""
+    messages = _build_legacy_messages(paper_text, difficulty, num_mocks)
+    async with _async_client(api_key, client) as client, _llm_semaphore():
+        raw = await cached_completion(client, model=model_name, messages=messages, temperature=0.7)
+    return _parse_legacy_output(raw, num_mocks)
+
+
+_MOCK_PAPER_TAG = "### mock paper"
+_ANSWER_KEY_TAG = "### answer key"
 
-        resp = client.chat_completions.create(  # type: ignore[attr-defined]
-            model=model_name,
-            messages=[
-                {"role": "system", "content": LEGACY_SYSTEM},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,
-        ) if hasattr(client, "chat_completions") else client.chat.completions.create(
-            model=model_name,
-            messages=[
-                {"role": "system", "content": LEGACY_SYSTEM},
-                {"role": "user", "content": prompt},
-            ],
-            temperature=0.7,
-        )
-        raw = resp.choices[0].message.content.strip() if resp.choices else ""
 
-        # Improved pairing logic:
-        # Keep a list of pairs; when we hit "MOCK PAPER", start a new pair;
-        # when we hit "ANSWER KEY", attach answers to the most recent pair that lacks them.
-        pairs: List[Dict[str, List[str]]] = []
-        current_mode: Optional[str] = None  # "paper" | "answers" | None
-        current_idx: Optional[int] = None
+def _parse_legacy_output(raw: str, num_mocks: int) -> List[Tuple[str, str]]:
+    """Split a legacy completion into (paper, answers) pairs, padded to num_mocks."""
+    # Improved pairing logic:
+    # Keep a list of pairs; when we hit "MOCK PAPER", start a new pair;
+    # when we hit "ANSWER KEY", attach answers to the most recent pair that lacks them.
+    pairs: List[Dict[str, List[str]]] = []
+    sink: Optional[List[str]] = None  # line list of the current paper/answers, if any
 
-        for line in raw.splitlines():
+    for line in raw.splitlines():
+        # Only lines starting with "#" can be tags; skip strip/lower for the rest
+        if line.lstrip().startswith("#"):
             tag = line.strip().lower()
 
-            if tag.startswith("### mock paper"):
+            if tag.startswith(_MOCK_PAPER_TAG):
                 # Start a new pair
                 pairs.append({"paper": [], "answers": []})
-                current_idx = len(pairs) - 1
-                current_mode = "paper"
+                sink = pairs[-1]["paper"]
                 continue
 
-            if tag.startswith("### answer key"):
+            if tag.startswith(_ANSWER_KEY_TAG):
                 # Attach to most recent pair without answers; create one if needed
                 attach_idx = None
                 for i in range(len(pairs) - 1, -1, -1):
@@ -594,22 +799,211 @@ def generate_mock_papers(
                 if attach_idx is None:
                     pairs.append({"paper": [], "answers": []})
                     attach_idx = len(pairs) - 1
-                current_idx = attach_idx
-                current_mode = "answers"
+                sink = pairs[attach_idx]["answers"]
                 continue
 
-            if current_mode and current_idx is not None:
-                pairs[current_idx][current_mode].append(normalize_unicode_math(line))
+        if sink is not None:
+            sink.append(normalize_unicode_math(line))
 
-        # Convert to outputs; ensure we have num_mocks pairs (pad if needed)
-        outputs: List[Tuple[str, str]] = []
-        for pair in pairs:
-            paper = "\n".join(pair["paper"]).strip()
-            answers = "\n".join(pair["answers"]).strip()
-            if paper or answers:
-                outputs.append((paper, answers))
+    # Convert to outputs; ensure we have num_mocks pairs (pad if needed)
+    outputs: List[Tuple[str, str]] = []
+    for pair in pairs:
+        paper = "\n".join(pair["paper"]).strip()
+        answers = "\n".join(pair["answers"]).strip()
+        if paper or answers:
+            outputs.append((paper, answers))
 
-        while len(outputs) < max(1, min(num_mocks, 3)):
-            outputs.append(("", ""))
+    while len(outputs) < max(1, min(num_mocks, 3)):
+        outputs.append(("", ""))
 
-        return outputs[:num_mocks]
+    return outputs[:num_mocks]
+
+
+# In-flight generations by exact request (text, knobs, API key).
+# concurrent.futures rather than asyncio futures: the sync entry point runs one
+# event loop per worker thread, so duplicate requests usually arrive on
+# different loops.
+_INFLIGHT: Dict[str, "concurrent.futures.Future[List[Tuple[str, str]]]"] = {}
+_INFLIGHT_LOCK = threading.Lock()
+
+
+async def agenerate_mock_papers(
+    paper_text: str,
+    difficulty: str = "same",
+    num_mocks: int = 1,
+    model_name: str = OPENAI_DEFAULT_MODEL,
+    api_key: Optional[str] = None,
+    client: Optional[AsyncOpenAI] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Async variant of generate_mock_papers.
+    Structured mocks are requested concurrently; the legacy fallback is
+    awaited on the same (optionally shared) client. A request identical to
+    one already running (double submit, same paper from two users) awaits
+    that run instead of calling the API again.
+    """
+    # Clip once; every prompt, retry and the cache key reuse the same string
+    paper_text = _clip_reference(paper_text)
+    key = _mock_cache_key(paper_text, model_name, difficulty, num_mocks)
+    # Dedupe only byte-identical requests: the exact clipped text, not the
+    # cache key's normalized form (dedupe is on even when caching is off)
+    flight = hashlib.blake2b(digest_size=20)
+    for part in (paper_text, model_name, difficulty, str(num_mocks), api_key or ""):
+        flight.update(part.encode("utf-8"))
+        flight.update(b"\0")
+    flight_key = flight.hexdigest()
+
+    with _INFLIGHT_LOCK:
+        fut = _INFLIGHT.get(flight_key)
+        owner = fut is None
+        if owner:
+            fut = _INFLIGHT[flight_key] = concurrent.futures.Future()
+            fut.set_running_or_notify_cancel()  # a cancelled follower must not cancel the shared run
+    if not owner:
+        return list(await asyncio.wrap_future(fut))
+
+    try:
+        out = await _agenerate_mock_papers_once(
+            paper_text, difficulty, num_mocks, model_name, api_key, client,
+            key if _cache_enabled() else None,
+        )
+    except BaseException as e:
+        fut.set_exception(e)
+        raise
+    else:
+        fut.set_result(out)
+        return out
+    finally:
+        with _INFLIGHT_LOCK:
+            _INFLIGHT.pop(flight_key, None)
+
+
+async def _agenerate_mock_papers_once(
+    paper_text: str,
+    difficulty: str,
+    num_mocks: int,
+    model_name: str,
+    api_key: Optional[str],
+    client: Optional[AsyncOpenAI],
+    key: Optional[str],
+) -> List[Tuple[str, str]]:
+    """Cache lookup, generation and cache fill for one (already clipped) request."""
+    threshold = semantic_threshold() if key else None
+    scope = f"{model_name}|{difficulty}|{num_mocks}"
+    emb = None
+    if key:
+        hit = _response_cache().get(key)
+        if hit is None and threshold is not None:
+            # Near-duplicate reference (whitespace/OCR noise) → reuse its entry
+            emb = await asyncio.to_thread(_semantic_index().embed, paper_text)
+            near_key = _semantic_index().lookup(emb, scope, threshold)
+            hit = _response_cache().get(near_key) if near_key else None
+        if hit is not None:
+            return hit
+
+    try:
+        specs = await _agenerate_mock_specs_typed(
+            paper_text, difficulty, num_mocks, model_name, api_key, client=client,
+        )
+        out = [_finalize_and_render(spec) for spec in specs]
+    except Exception:
+        # Legacy fallback (text parsing)
+        out = await _alegacy_generate_mock_papers(
+            paper_text, difficulty, num_mocks, model_name, api_key, client=client,
+        )
+
+    # Cache the final rendered pairs, whichever path produced them (never empty padding)
+    if key and any(paper for paper, _ in out):
+        _response_cache().set(key, out)
+        if emb is not None:
+            _semantic_index().add(emb, scope, key)
+    return out
+
+
+async def aiter_mock_papers(
+    paper_text: str,
+    difficulty: str = "same",
+    num_mocks: int = 1,
+    model_name: str = OPENAI_DEFAULT_MODEL,
+    api_key: Optional[str] = None,
+) -> AsyncIterator[Tuple[int, str, str]]:
+    """
+    Yield (index, paper_text, answer_key_text) for each mock as soon as its
+    request finishes, so callers can start on the first mock while the
+    others are still generating. Index is 0-based; order is completion order.
+    A mock whose structured request fails is regenerated alone via the legacy prompt.
+    """
+    paper_text = _clip_reference(paper_text)
+    num_mocks = max(1, min(num_mocks, 3))
+
+    async with configure_openai_async(api_key) as client:
+        async def _one(i: int) -> Tuple[int, Tuple[str, str]]:
+            try:
+                m = await _agenerate_one_spec(
+                    client, paper_text, difficulty, model_name, i + 1, num_mocks
+                ) or _empty_mock_spec()
+                return i, _finalize_and_render(m)
+            except Exception:
+                pairs = await _alegacy_generate_mock_papers(
+                    paper_text, difficulty, 1, model_name, api_key, client=client,
+                )
+                return i, pairs[0]
+
+        tasks = [asyncio.create_task(_one(i)) for i in range(num_mocks)]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                i, (paper, answers) = await fut
+                yield i, paper, answers
+        finally:
+            for t in tasks:
+                t.cancel()
+
+
+async def agenerate_mock_papers_many(
+    papers: List[str],
+    difficulty: str = "same",
+    num_mocks: int = 1,
+    model_name: str = OPENAI_DEFAULT_MODEL,
+    api_key: Optional[str] = None,
+) -> List[List[Tuple[str, str]]]:
+    """
+    Generate mocks for several reference papers concurrently over one
+    shared client; results are in the same order as `papers`.
+    """
+    async with configure_openai_async(api_key) as client:
+        return list(await asyncio.gather(*[
+            agenerate_mock_papers(
+                paper_text=p,
+                difficulty=difficulty,
+                num_mocks=num_mocks,
+                model_name=model_name,
+                api_key=api_key,
+                client=client,
+            )
+            for p in papers
+        ]))
+
+
+def generate_mock_papers(
+    paper_text: str,
+    difficulty: str = "same",
+    num_mocks: int = 1,
+    model_name: str = OPENAI_DEFAULT_MODEL,
+    api_key: Optional[str] = None,
+) -> List[Tuple[str, str]]:
+    """
+    Returns a list of (paper_text, answer_key_text) tuples.
+    Structured path first; if it fails, use legacy text format with
+    improved pairing logic to avoid question splitting across mocks.
+    With MOCKGEN_CACHE=1, rendered mocks are cached on disk by content;
+    MOCKGEN_SEMANTIC_THRESHOLD additionally matches near-duplicate references.
+    Sync entry point: runs agenerate_mock_papers on a private event loop,
+    so call it from a worker thread (as the pipeline does), not from async code.
+    """
+    return asyncio.run(agenerate_mock_papers(
+        paper_text=paper_text,
+        difficulty=difficulty,
+        num_mocks=num_mocks,
+        model_name=model_name,
+        api_key=api_key,
+    ))
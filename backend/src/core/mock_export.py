@@ -11,14 +11,22 @@ Fallback:
 Public API:
 - build_mockpaper_pdf(text, out_path, title="...", source_name=None, instructions=None)
 - build_mockpaper_pdf_from_spec(spec: dict, out_path: str)
+- build_mockpapers_pdf_batch([(text, out_path, title), ...])  -> one Chromium page for all
 """
 
 from __future__ import annotations
 
 from typing import Optional, List, Tuple, Dict, Any
 from pathlib import Path
+import atexit
+import base64
+import concurrent.futures
+import functools
+import os
 import re
 import html
+import queue
+import threading
 
 # -------- Optional imports --------
 try:
@@ -35,12 +43,6 @@ try:
 except Exception:
     _HAS_MD = False
 
-try:
-    from jinja2 import Environment, BaseLoader, select_autoescape  # type: ignore
-    _HAS_JINJA = True
-except Exception:
-    _HAS_JINJA = False
-
 
 # ============================================================
 # HTML / KaTeX rendering (preferred)
@@ -130,14 +132,51 @@ pre, code {
 }
 """
 
-_HTML_TMPL = """<!doctype html>
+# KaTeX: inline a local copy (assets/katex, fetched at image build) so
+# page loads never touch the network; fall back to the CDN otherwise.
+KATEX_DIR = Path(os.getenv("KATEX_DIR", Path(__file__).resolve().parents[2] / "assets" / "katex"))
+
+_KATEX_CDN_HEAD = """
+  <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.11/dist/katex.min.css"/>
+  <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.11/dist/katex.min.js"></script>
+  <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.11/dist/contrib/auto-render.min.js"></script>
+"""
+
+_KATEX_FONT_URL_RE = re.compile(r"url\(fonts/([^)]+?\.woff2)\)")
+
+
+def _load_katex_inline() -> Optional[str]:
+    """<style>/<script> block with KaTeX (woff2 fonts as data URIs), or None if not bundled."""
+    css_p = KATEX_DIR / "katex.min.css"
+    js_p = KATEX_DIR / "katex.min.js"
+    auto_p = KATEX_DIR / "contrib" / "auto-render.min.js"
+    if not (css_p.exists() and js_p.exists() and auto_p.exists()):
+        return None
+
+    def _font_data_uri(m: re.Match) -> str:
+        font = KATEX_DIR / "fonts" / m.group(1)
+        if not font.exists():
+            return m.group(0)
+        return "url(data:font/woff2;base64," + base64.b64encode(font.read_bytes()).decode("ascii") + ")"
+
+    css = _KATEX_FONT_URL_RE.sub(_font_data_uri, css_p.read_text(encoding="utf-8"))
+    return (
+        f"\n  <style>{css}</style>"
+        f"\n  <script>{js_p.read_text(encoding='utf-8')}</script>"
+        f"\n  <script>{auto_p.read_text(encoding='utf-8')}</script>\n"
+    )
+
+
+_KATEX_INLINE = _load_katex_inline()
+_KATEX_HEAD = _KATEX_INLINE or _KATEX_CDN_HEAD
+
+# Static page shell; _html_wrapper only fills in the title/meta/body between them
+_HTML_HEAD = """<!doctype html>
 <html>
 <head>
   <meta charset="utf-8"/>
   <style>""" + _CSS + """</style>
-  <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/katex@0.16.11/dist/katex.min.css"/>
-  <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.11/dist/katex.min.js"></script>
-  <script defer src="https://cdn.jsdelivr.net/npm/katex@0.16.11/dist/contrib/auto-render.min.js"></script>
+  """ + _KATEX_HEAD + """
   <script>
     document.addEventListener("DOMContentLoaded", function() {
       renderMathInElement(document.body, {
@@ -155,16 +194,15 @@ _HTML_TMPL = """<!doctype html>
 </head>
 <body>
 
-<h1>{{ title }}</h1>
-{% if source_name %}<div class="meta">Generated from {{ source_name }}</div>{% endif %}
-{% if instructions %}<div class="meta"><em>{{ instructions|safe }}</em></div>{% endif %}
+"""
 
-{{ body|safe }}
+_HTML_TAIL = """
 
 </body>
 </html>
 """
 
+@functools.lru_cache(maxsize=1)
 def _mk_md():
     if not _HAS_MD:
         class _Dummy:
@@ -174,21 +212,25 @@ def _mk_md():
             .use(footnote_plugin)
             .use(anchors_plugin, permalink=False))
 
-def _mk_env():
-    if not _HAS_JINJA:
-        raise RuntimeError("Jinja2 not available; cannot render HTML template.")
-    return Environment(loader=BaseLoader(), autoescape=select_autoescape())
+@functools.lru_cache(maxsize=4096)
+def _render_md(s: str) -> str:
+    """Markdown snippet -> HTML on the shared parser; stems and options repeat a lot."""
+    return _mk_md().render(s)
 
 
 # ---------------- Plain-text → HTML (heuristic) ----------------
-_OPT_RE    = re.compile(r"^\s*([A-Da-d])[\.\)]\s+(.+)")
-_Q_RE      = re.compile(r"^\s*((?:Q\s*)?\d+[\.\)]\s+.+)", re.I)
-_SEC_RE    = re.compile(r"^\s*section\b", re.I)
-_MARKS_RE  = re.compile(r"\bmark\b", re.I)
+# One anchored scan per stripped line; alternatives in priority order
+# (section, MCQ option, question, marks) and m.lastgroup names the kind.
+_HTML_LINE_RE = re.compile(
+    r"(?P<section>section\b)"
+    r"|(?P<option>(?P<opt_key>[A-Da-d])[\.\)]\s+(?P<opt_text>.+))"
+    r"|(?P<question>(?:Q\s*)?\d+[\.\)]\s+.+)"
+    r"|(?P<marks>.*?\bmark\b)",
+    re.I,
+)
 
 def _group_lines_into_html(paper_text: str) -> str:
     lines = paper_text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
-    md = _mk_md()
 
     html_parts: List[str] = []
     buffer_question: List[str] = []
@@ -199,13 +241,13 @@ def _group_lines_into_html(paper_text: str) -> str:
         nonlocal buffer_question, buffer_opts, in_opts
         if not buffer_question and not buffer_opts:
             return
-        q_html = md.render("\n".join(buffer_question).strip())
+        q_html = _render_md("\n".join(buffer_question).strip())
         if buffer_opts:
             html_parts.append("<div class='item'>")
             html_parts.append(f"<div class='stem'>{q_html}</div>")
             html_parts.append("<div class='mcq'><ol>")
             for key, txt in buffer_opts:
-                html_parts.append(f"<li>{md.render(txt)}</li>")
+                html_parts.append(f"<li>{_render_md(txt)}</li>")
             html_parts.append("</ol></div>")
             html_parts.append("</div>")
         else:
@@ -214,6 +256,7 @@ def _group_lines_into_html(paper_text: str) -> str:
         buffer_opts = []
         in_opts = False
 
+    match_line = _HTML_LINE_RE.match
     for raw in lines:
         ln = raw.strip()
         if not ln:
@@ -221,25 +264,25 @@ def _group_lines_into_html(paper_text: str) -> str:
             html_parts.append("<div style='height:5mm'></div>")
             continue
 
-        if _SEC_RE.match(ln):
+        m = match_line(ln)
+        kind = m.lastgroup if m else None
+
+        if kind == "section":
             flush_question()
             html_parts.append(f"<h2>{html.escape(ln)}</h2>")
             continue
 
-        mopt = _OPT_RE.match(ln)
-        if mopt:
+        if kind == "option":
             in_opts = True
-            key = mopt.group(1).upper()
-            txt = mopt.group(2)
-            buffer_opts.append((key, txt))
+            buffer_opts.append((m.group("opt_key").upper(), m.group("opt_text")))
             continue
 
-        if _Q_RE.match(ln):
+        if kind == "question":
             flush_question()
             buffer_question.append(ln)
             continue
 
-        if _MARKS_RE.search(ln):
+        if kind == "marks":
             flush_question()
             html_parts.append(f"<div class='points'>{html.escape(ln)}</div>")
             continue
@@ -251,49 +294,168 @@ def _group_lines_into_html(paper_text: str) -> str:
             if buffer_question:
                 buffer_question.append(ln)
             else:
-                html_parts.append(f"<div class='item'>{md.render(ln)}</div>")
+                html_parts.append(f"<div class='item'>{_render_md(ln)}</div>")
 
     flush_question()
     return "\n".join(html_parts)
 
 
 def _html_wrapper(body_html: str, title: str, source_name: Optional[str], instructions: Optional[str] = None) -> str:
-    env = _mk_env()
-    tpl = env.from_string(_HTML_TMPL)
-    return tpl.render(title=title, source_name=source_name, instructions=instructions, body=body_html)
+    parts = [_HTML_HEAD, f"<h1>{html.escape(title)}</h1>\n"]
+    if source_name:
+        parts.append(f'<div class="meta">Generated from {html.escape(source_name)}</div>\n')
+    if instructions:
+        parts.append(f'<div class="meta"><em>{instructions}</em></div>\n')  # trusted markup, as before
+    parts.append(body_html)
+    parts.append(_HTML_TAIL)
+    return "".join(parts)
+
+
+# Playwright's sync API is bound to the thread that started it. All printing
+# runs on one long-lived render thread that owns the only driver/Chromium:
+# request threads (anyio retires idle ones after 10 s) would otherwise each
+# leave a driver and browser behind. Every PDF gets a fresh context.
+_PW_LOCAL = threading.local()
+_RENDER_JOBS: "queue.Queue[Optional[tuple]]" = queue.Queue()
+_RENDER_THREAD: Optional[threading.Thread] = None
+_RENDER_LOCK = threading.Lock()
+
+
+def _render_loop() -> None:
+    while True:
+        job = _RENDER_JOBS.get()
+        if job is None:  # interpreter exit: close Chromium and the driver
+            _reset_browser()
+            return
+        fn, args, fut = job
+        if fut.set_running_or_notify_cancel():
+            try:
+                fut.set_result(fn(*args))
+            except BaseException as e:
+                fut.set_exception(e)
+
+
+def _stop_render_thread() -> None:
+    _RENDER_JOBS.put(None)
+    if _RENDER_THREAD is not None:
+        _RENDER_THREAD.join(timeout=10)
+
+
+def _on_render_thread(fn, *args):
+    """Run fn(*args) on the render thread (started on first use) and return its result."""
+    global _RENDER_THREAD
+    with _RENDER_LOCK:
+        if _RENDER_THREAD is None:
+            # Daemon, so it is still alive when the atexit hook asks it to shut down
+            _RENDER_THREAD = threading.Thread(target=_render_loop, name="mockpaper-render", daemon=True)
+            _RENDER_THREAD.start()
+            atexit.register(_stop_render_thread)
+    fut: concurrent.futures.Future = concurrent.futures.Future()
+    _RENDER_JOBS.put((fn, args, fut))
+    return fut.result()
+
+
+def _get_browser():
+    """Chromium for the current thread, launched on first use."""
+    browser = getattr(_PW_LOCAL, "browser", None)
+    if browser is None or not browser.is_connected():
+        pw = getattr(_PW_LOCAL, "pw", None)
+        if pw is None:
+            pw = _PW_LOCAL.pw = sync_playwright().start()
+        browser = _PW_LOCAL.browser = pw.chromium.launch()
+    return browser
+
+
+def _reset_browser() -> None:
+    """Drop this thread's browser/driver so the next call starts clean."""
+    browser = getattr(_PW_LOCAL, "browser", None)
+    pw = getattr(_PW_LOCAL, "pw", None)
+    _PW_LOCAL.browser = _PW_LOCAL.pw = None
+    for closer in (getattr(browser, "close", None), getattr(pw, "stop", None)):
+        try:
+            if closer:
+                closer()
+        except Exception:
+            pass
+
+
+def _new_page(context):
+    page = context.new_page()
+    if _KATEX_INLINE:
+        # Everything is inline: refuse any stray network fetch instead of waiting on it
+        page.route("**/*", lambda r: r.abort() if r.request.url.startswith("http") else r.continue_())
+    return page
+
+
+def _print_page(page, html_str: str, out_pdf: str, title: str) -> None:
+    out = Path(out_pdf)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    page.set_content(html_str, wait_until="load")
+    page.pdf(
+        path=str(out),
+        format="A4",
+        display_header_footer=True,
+        header_template=(
+            "<div style='font-size:10px; width:100%; text-align:left; "
+            "padding-left:14mm; color:#4d3d84;'>"
+            + html.escape(title) +
+            "</div>"
+        ),
+        footer_template=(
+            "<div style='font-size:10px; width:100%; text-align:center;'>"
+            "Page <span class='pageNumber'></span></div>"
+        ),
+        margin={"top": "20mm", "right": "18mm", "bottom": "20mm", "left": "18mm"},
+        print_background=True,
+    )
 
 
 def _html_to_pdf(html_str: str, out_pdf: str, title: str = "Mock Paper") -> bool:
-    if not _HAS_PLAYWRIGHT:
-        return False
-    out = Path(out_pdf)
-    out.parent.mkdir(parents=True, exist_ok=True)
+    return _html_batch_to_pdf([(html_str, out_pdf, title)])[0]
+
+
+def _html_batch_to_pdf(items: List[Tuple[str, str, str]]) -> List[bool]:
+    """
+    Print (html_str, out_pdf, title) items through one context and one page,
+    so KaTeX/script parsing and page setup are paid once per batch.
+    Returns per-item success; failed items are left for the caller's fallback.
+    """
+    if not _HAS_PLAYWRIGHT or not items:
+        return [False] * len(items)
+    return _on_render_thread(_print_batch, items)
+
+
+def _print_batch(items: List[Tuple[str, str, str]]) -> List[bool]:
+    """_html_batch_to_pdf body; runs on the render thread."""
+    done = [False] * len(items)
+    try:
+        context = _get_browser().new_context()
+    except Exception:
+        _reset_browser()
+        return done
     try:
-        with sync_playwright() as p:
-            browser = p.chromium.launch()
-            page = browser.new_page()
-            page.set_content(html_str, wait_until="load")
-            page.pdf(
-                path=str(out),
-                format="A4",
-                display_header_footer=True,
-                header_template=(
-                    "<div style='font-size:10px; width:100%; text-align:left; "
-                    "padding-left:14mm; color:#4d3d84;'>"
-                    + html.escape(title) +
-                    "</div>"
-                ),
-                footer_template=(
-                    "<div style='font-size:10px; width:100%; text-align:center;'>"
-                    "Page <span class='pageNumber'></span></div>"
-                ),
-                margin={"top": "20mm", "right": "18mm", "bottom": "20mm", "left": "18mm"},
-                print_background=True,
-            )
-            browser.close()
-        return True
+        page = _new_page(context)
+        for i, (html_str, out_pdf, title) in enumerate(items):
+            try:
+                _print_page(page, html_str, out_pdf, title)
+                done[i] = True
+            except Exception:
+                # A crashed page would fail every later item; start a fresh one
+                try:
+                    page.close()
+                    page = _new_page(context)
+                except Exception:
+                    break
     except Exception:
-        return False
+        pass
+    finally:
+        try:
+            context.close()
+        except Exception:
+            _reset_browser()
+    if not all(done):
+        _reset_browser()
+    return done
 
 
 # ============================================================
@@ -304,22 +466,23 @@ from reportlab.platypus import SimpleDocTemplate as _SimpleDocTemplate, Paragrap
 from reportlab.lib.styles import getSampleStyleSheet as _getSampleStyleSheet, ParagraphStyle as _ParagraphStyle
 from reportlab.lib.units import mm as _mm
 
+# Built once at import; getSampleStyleSheet() constructs a fresh sheet per call
+_RL_BASE = _ParagraphStyle(
+    "MockBody", parent=_getSampleStyleSheet()["BodyText"], fontName="Times-Roman", fontSize=11, leading=14
+)
+_RL_TITLE = _ParagraphStyle(
+    "Title", parent=_RL_BASE, fontSize=16, leading=20, spaceAfter=6*_mm, textColor="#233d7b"
+)
+_RL_META = _ParagraphStyle(
+    "Meta", parent=_RL_BASE, fontSize=10, leading=12, textColor="#666666", spaceAfter=4*_mm, italic=True
+)
+_PARA_SPLIT_RE = re.compile(r"\n\s*\n")
+
 def _reportlab_text_pdf(text: str, out_pdf: str, title: str, source_name: Optional[str], instructions: Optional[str]) -> None:
     out = Path(out_pdf)
     out.parent.mkdir(parents=True, exist_ok=True)
 
-    styles = _getSampleStyleSheet()
-    base = styles["BodyText"]
-    base.fontName = "Times-Roman"
-    base.fontSize = 11
-    base.leading = 14
-
-    title_style = _ParagraphStyle(
-        "Title", parent=base, fontSize=16, leading=20, spaceAfter=6*_mm, textColor="#233d7b"
-    )
-    meta_style = _ParagraphStyle(
-        "Meta", parent=base, fontSize=10, leading=12, textColor="#666666", spaceAfter=4*_mm, italic=True
-    )
+    base, title_style, meta_style = _RL_BASE, _RL_TITLE, _RL_META
 
     story: List[Any] = []
     story.append(_Paragraph(html.escape(title), title_style))
@@ -329,7 +492,7 @@ def _reportlab_text_pdf(text: str, out_pdf: str, title: str, source_name: Option
         story.append(_Paragraph(html.escape(instructions), meta_style))
     story.append(_Spacer(1, 6*_mm))
 
-    paras = re.split(r"\n\s*\n", text.strip())
+    paras = _PARA_SPLIT_RE.split(text.strip())
     for para in paras:
         para_html = "<br/>".join(html.escape(line) for line in para.splitlines())
         story.append(_Paragraph(para_html, base))
@@ -365,6 +528,27 @@ def build_mockpaper_pdf(
     return str(out_path)
 
 
+def build_mockpapers_pdf_batch(
+    items: List[Tuple[str, str, str]],
+    source_name: Optional[str] = None,
+    instructions: Optional[str] = None,
+) -> List[str]:
+    """
+    Build several PDFs from (text, out_path, title) triples in one browser
+    page; items the HTML path could not print fall back to ReportLab.
+    """
+    docs = [
+        (_html_wrapper(_group_lines_into_html(text), title=title, source_name=source_name, instructions=instructions),
+         out_path, title)
+        for text, out_path, title in items
+    ]
+    ok = _html_batch_to_pdf(docs)
+    for (text, out_path, title), printed in zip(items, ok):
+        if not printed:
+            _reportlab_text_pdf(text, out_path, title, source_name, instructions)
+    return [str(out_path) for _, out_path, _ in items]
+
+
 def build_mockpaper_pdf_from_spec(spec: Dict[str, Any], out_path: str) -> str:
     title = spec.get("title") or "Mock Exam Paper"
     source_name = spec.get("source_name")
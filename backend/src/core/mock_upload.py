@@ -5,103 +5,214 @@ Robust text extraction utilities for uploaded mock exam papers (PDF/DOCX).
 
 - PDF: prefer native text layer, fallback to OCR (EasyOCR) for scanned/math regions.
 - DOCX: use python-docx for text extraction.
-- OCR preprocessing: grayscale, binarize, denoise.
+- OCR preprocessing (binarize, denoise) is opt-in: EasyOCR does its own,
+  and extra binarization can hurt its CRAFT detector.
 - Outputs both plain text and simple HTML (with math spans preserved).
 """
 
+import hashlib
+import os
+import queue
+import re
+import tempfile
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import List, Dict
+from typing import Any, List, Dict, Optional, Tuple
 
 import fitz  # PyMuPDF
 from docx import Document
 import numpy as np
-import cv2
 
-from .ocr import get_ocr_engine, ocr_image_easy
+from .ocr import (
+    _preprocess_for_ocr, get_ocr_engine, ocr_images_easy, ocr_page_dpi,
+    ocr_pdf_pages_parallel, ocr_worker_count, prewarm_ocr_engine,
+)
 
 
-# =========================
-# Preprocessing helper
-# =========================
-def _preprocess_for_ocr(img: np.ndarray) -> np.ndarray:
-    """Convert to grayscale + binarize + denoise for sharper OCR."""
-    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY) if img.ndim == 3 else img
-    th = cv2.adaptiveThreshold(
-        gray, 255,
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY, 35, 11
-    )
-    th = cv2.fastNlMeansDenoising(th, h=15)
-    return th
+# Text-layer thresholds: pages with fewer than PAGE_TEXT_CHARS native
+# characters are sent to OCR. A document with no such page that averages more
+# than DOC_TEXT_CHARS per page is treated as born-digital (no OCR set-up at
+# all); a mostly digital PDF with a few scanned pages still OCRs those pages.
+DOC_TEXT_CHARS = 200
+PAGE_TEXT_CHARS = 50
+
+# Plain reading-order text only: no image blocks, no dehyphenation (it would
+# join "x -" line breaks in equations), and glyphs without a Unicode mapping
+# are dropped rather than emitted as U+FFFD filler that inflates the counts above.
+_NATIVE_TEXT_FLAGS = fitz.TEXT_PRESERVE_LIGATURES | fitz.TEXT_PRESERVE_WHITESPACE | fitz.TEXT_MEDIABOX_CLIP
+
+# In-process OCR renders pages ahead of the reader into a bounded queue, so a
+# long scan holds at most OCR_QUEUE_PAGES page images (~9 MB each at 300 dpi)
+# instead of the whole document; the reader drains it OCR_BATCH_PAGES at a time.
+OCR_QUEUE_PAGES = 16
+OCR_BATCH_PAGES = 8
 
 
 # =========================
 # Internal helpers
 # =========================
+_MATH_DELIMS = {
+    "\\(": '<span class="math">', "\\)": "</span>",
+    "\\[": '<div class="math">',  "\\]": "</div>",
+}
+_MATH_DELIM_RE = re.compile(r"\\[()\[\]]")
+
+
 def _wrap_html_paragraphs(text: str) -> str:
     """
     Wrap plain text into HTML paragraphs, preserving math spans.
     Math expressions like \( ... \) or \[ ... \] are wrapped in <span>/<div>.
     """
-    html_lines: List[str] = []
-    for line in text.splitlines():
-        line = line.strip()
-        if not line:
-            continue
-
-        # Replace LaTeX-style math delimiters with spans
-        line = line.replace("\\(", '<span class="math">').replace("\\)", "</span>")
-        line = line.replace("\\[", '<div class="math">').replace("\\]", "</div>")
-
-        html_lines.append(f"<p>{line}</p>")
-
-    return "\n".join(html_lines)
-
-
-def _extract_text_from_pdf(path: str, lang: str = "en", dpi: int = 400) -> str:
+    # Replace LaTeX-style math delimiters in one pass over the whole text
+    text = _MATH_DELIM_RE.sub(lambda m: _MATH_DELIMS[m.group(0)], text)
+    return "\n".join(f"<p>{line}</p>" for line in map(str.strip, text.splitlines()) if line)
+
+
+def _display_list_text(dl: "fitz.DisplayList") -> str:
+    """Native text of a page's display list (same output as page.get_text)."""
+    tp = dl.get_textpage(flags=_NATIVE_TEXT_FLAGS)
+    if not isinstance(tp, fitz.TextPage):  # PyMuPDF 1.24 hands back the raw MuPDF object
+        tp = fitz.TextPage(tp)
+    return tp.extractText()
+
+
+def _ocr_pages_streamed(
+    display_lists: List["fitz.DisplayList"],
+    reader: Any,
+    dpi: int,
+    binarize: str,
+    preprocess: bool,
+) -> List[List[Dict[str, Any]]]:
+    """
+    OCR pages (as display lists) in-process. A producer thread
+    renders pages into a bounded queue (blocking when it is full) while this
+    thread OCRs them in batches, so rendering overlaps OCR and memory stays flat.
+    """
+    pages: "queue.Queue[Optional[np.ndarray]]" = queue.Queue(maxsize=OCR_QUEUE_PAGES)
+    stop = threading.Event()
+    errors: List[BaseException] = []
+
+    def _put(item: Optional[np.ndarray]) -> bool:
+        while not stop.is_set():
+            try:
+                pages.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _render() -> None:
+        try:
+            for k, dl in enumerate(display_lists):
+                display_lists[k] = None  # release each page once rendered
+                # Render page straight to 8-bit gray; EasyOCR works on gray anyway
+                zoom = ocr_page_dpi(dl, dpi) / 72
+                pix = dl.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+                gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+                if not _put(_preprocess_for_ocr(gray, binarize) if preprocess else gray):
+                    return
+        except BaseException as e:  # surfaced on the consumer side
+            errors.append(e)
+        finally:
+            _put(None)
+
+    producer = threading.Thread(target=_render, name="ocr-render", daemon=True)
+    producer.start()
+    results: List[List[Dict[str, Any]]] = []
+    batch: List[np.ndarray] = []
+    try:
+        while True:
+            img = pages.get()
+            if img is not None:
+                batch.append(img)
+            if batch and (img is None or len(batch) == OCR_BATCH_PAGES):
+                results.extend(ocr_images_easy(reader, batch, batch_size=OCR_BATCH_PAGES, preprocess=False))
+                batch = []
+            if img is None:
+                break
+    finally:
+        stop.set()
+        producer.join()
+    if errors:
+        raise errors[0]
+    return results
+
+
+def _extract_text_from_pdf(
+    path: str,
+    lang: str = "en",
+    dpi: int = 300,
+    reader: Optional[Any] = None,
+    binarize: str = "auto",
+    preprocess: bool = False,
+) -> str:
     """
     Extract text from a PDF file.
-    - Try native PDF text layer first.
-    - Fallback to OCR (EasyOCR) for scanned pages.
+    - Try native PDF text layer first; skip OCR entirely for text-dense docs.
+    - Fallback to OCR (EasyOCR) for sparse/scanned pages, batched in one pass.
+    - Pages render at `dpi` (300 is standard for OCR), capped per page so
+      oversized sheets stay within OCR_MAX_SIDE_PX on the long side.
+    - Gray page renders go to EasyOCR as is; preprocess=True binarizes and
+      denoises them first, with `binarize` picking the threshold
+      ("auto" | "otsu" | "adaptive").
+    - Uses `reader` if given, otherwise lazily creates one.
     - Returns plain text string.
     """
-    text_blocks: List[str] = []
     doc = fitz.open(path)
-
-    # OCR engine (lazy init)
-    reader = None
-
+    per_page: List[str] = []
+    sparse: Dict[int, "fitz.DisplayList"] = {}
     for i, page in enumerate(doc):
-        native_text = page.get_text("text").strip()
-        if native_text:
+        # One content-stream parse per page: the display list yields the text
+        # layer and, for sparse pages, the OCR render as well
+        dl = page.get_displaylist()
+        native_text = _display_list_text(dl).strip()
+        per_page.append(native_text)
+        if len(native_text) < PAGE_TEXT_CHARS:
+            sparse[i] = dl
+    if not sparse and doc.page_count and sum(map(len, per_page)) / doc.page_count > DOC_TEXT_CHARS:
+        print(f"[DEBUG] {Path(path).name}: text layer present, skipping OCR")
+        return "\n".join(t for t in per_page if t)
+
+    text_blocks: List[Optional[str]] = []
+    ocr_pages: List[int] = []
+
+    # Pass 1: native text, queue sparse/scanned pages for OCR
+    for i, native_text in enumerate(per_page):
+        text_blocks.append(native_text or None)
+        if len(native_text) >= PAGE_TEXT_CHARS:
             print(f"[DEBUG] Page {i}: native text ({len(native_text)} chars)")
-            text_blocks.append(native_text)
             continue
-
-        # Init OCR engine only if needed
-        if reader is None:
-            reader = get_ocr_engine(lang)
-
-        # Render page to image
-        pix = page.get_pixmap(matrix=fitz.Matrix(dpi / 72, dpi / 72))
-        img = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
-        if pix.n == 4:  # RGBA → RGB
-            img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
-
-        img = _preprocess_for_ocr(img)
-
-        # OCR fallback
-        results = ocr_image_easy(reader, img)
-        page_texts = [r["text"] for r in results if r.get("text")]
-
-        if page_texts:
-            joined = " ".join(page_texts)
-            print(f"[DEBUG] Page {i}: OCR extracted {len(joined)} chars")
-            text_blocks.append(joined)
+        ocr_pages.append(i)
+
+    # Pass 2: OCR fallback (process pool if configured, else batched in-process)
+    if ocr_pages:
+        workers = ocr_worker_count()
+        if workers > 1 and len(ocr_pages) > 1:
+            # Workers reopen the PDF and render their own pages in parallel
+            sparse.clear()
+            page_results = ocr_pdf_pages_parallel(
+                path, ocr_pages, lang=lang, dpi=dpi, max_workers=workers,
+                binarize=binarize, preprocess=preprocess,
+            )
         else:
-            print(f"[WARNING] Page {i}: OCR returned nothing")
+            # Init OCR engine only if needed
+            if reader is None:
+                reader = get_ocr_engine(lang)
+            page_results = _ocr_pages_streamed(
+                [sparse.pop(i) for i in ocr_pages], reader, dpi, binarize, preprocess,
+            )
+
+        for i, results in zip(ocr_pages, page_results):
+            page_texts = [r["text"] for r in results if r.get("text")]
+            if page_texts:
+                joined = " ".join(page_texts)
+                print(f"[DEBUG] Page {i}: OCR extracted {len(joined)} chars")
+                text_blocks[i] = joined
+            elif not text_blocks[i]:
+                print(f"[WARNING] Page {i}: OCR returned nothing")
 
-    return "\n".join(text_blocks)
+    return "\n".join(t for t in text_blocks if t)
 
 
 def _extract_text_from_docx(path: str) -> str:
@@ -111,8 +222,6 @@ def _extract_text_from_docx(path: str) -> str:
     return "\n".join(paras)
 
 
-import re
-
 _HARD_WRAP = re.compile(r"(?<=\S)-\s*\n(?=\S)")  # e.g., "com-\npute" -> "compute"
 _LINE_SP   = re.compile(r"[ \t]+\n")             # trailing spaces before newline
 _MULTI_NL  = re.compile(r"\n{3,}")               # collapse >2 blank lines
@@ -128,6 +237,90 @@ def _normalize_ws(s: str) -> str:
     return s.strip()
 
 
+# Extracted text per file content. Uploads land in a fresh temp dir each
+# request, so the key is a hash of the bytes, not the path or mtime.
+_TEXT_CACHE: "OrderedDict[Tuple[bytes, str, str, int, bool], str]" = OrderedDict()
+_TEXT_CACHE_MAX = 32
+_TEXT_CACHE_LOCK = threading.Lock()
+
+
+# Opt-in: with PAPERS_TEXT_CACHE_DIR set (e.g. ~/.cache/mockpaper/pages), PDF
+# text also persists on disk (one .txt per content hash and settings), so
+# re-running on the same reference papers skips OCR across restarts. Off by
+# default: it keeps every upload's text with no size or age bound.
+PAPERS_TEXT_CACHE_DIR = os.getenv("PAPERS_TEXT_CACHE_DIR", "")
+
+
+def _text_cache_path(digest: bytes, lang: str, dpi: int, preprocess: bool) -> Optional[Path]:
+    if not PAPERS_TEXT_CACHE_DIR:
+        return None
+    name = f"{digest.hex()}_{lang}_dpi{dpi}{'_pre' if preprocess else ''}.txt"
+    return Path(PAPERS_TEXT_CACHE_DIR) / name
+
+
+def _read_text_cache(path: Optional[Path]) -> Optional[str]:
+    if path is None:
+        return None
+    try:
+        return path.read_text(encoding="utf-8")
+    except OSError:
+        return None
+
+
+def _write_text_cache(path: Optional[Path], text: str) -> None:
+    """Atomic write (temp file + os.replace) so readers never see a partial file."""
+    if path is None:
+        return
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            fh.write(text)
+        os.replace(tmp, path)
+    except OSError as e:
+        print(f"[WARNING] Could not write text cache {path.name}: {e}")
+
+
+def _file_digest(p: Path) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    with open(p, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    return h.digest()
+
+
+def _extract_one(p: Path, lang: str, dpi: int, reader: Optional[Any], preprocess: bool = False) -> str:
+    """
+    Plain text of one uploaded PDF/DOCX; identical re-uploads are served from
+    memory, and PDFs seen by an earlier process from the on-disk cache.
+    """
+    suffix = p.suffix.lower()
+    digest = _file_digest(p)
+    key = (digest, suffix, lang, dpi, preprocess)
+    with _TEXT_CACHE_LOCK:
+        if key in _TEXT_CACHE:
+            _TEXT_CACHE.move_to_end(key)
+            print(f"[DEBUG] {p.name}: extracted text cached")
+            return _TEXT_CACHE[key]
+
+    if suffix == ".pdf":
+        disk_path = _text_cache_path(digest, lang, dpi, preprocess)
+        text = _read_text_cache(disk_path)
+        if text is not None:
+            print(f"[DEBUG] {p.name}: extracted text loaded from disk cache")
+        else:
+            text = _extract_text_from_pdf(str(p), lang=lang, dpi=dpi, reader=reader, preprocess=preprocess)
+            _write_text_cache(disk_path, text)
+    else:
+        text = _extract_text_from_docx(str(p))
+
+    with _TEXT_CACHE_LOCK:
+        _TEXT_CACHE[key] = text
+        if len(_TEXT_CACHE) > _TEXT_CACHE_MAX:
+            _TEXT_CACHE.popitem(last=False)
+    return text
+
+
 # =========================
 # Public API
 # =========================
@@ -135,11 +328,17 @@ def papers_to_clean_text(
     files: List[str],
     out_dir: str,
     lang: str = "en",
-    dpi: int = 400,
+    dpi: int = 300,
+    reader: Optional[Any] = None,
+    preprocess: bool = False,
 ) -> Dict[str, str]:
     """
     Extract text from uploaded PDF/DOCX mock papers,
-    concatenate into plain text + HTML files, and return their paths.
+    concatenate into plain text + HTML files, and return their paths
+    (plus the plain text itself under "text", so callers need not read it back).
+    An optional prebuilt EasyOCR `reader` is reused for scanned pages;
+    without one, a reader is built on a background thread up front.
+    preprocess=True binarizes/denoises scanned pages before OCR (off by default).
     """
     out_dir = Path(out_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
@@ -147,15 +346,22 @@ def papers_to_clean_text(
     all_plain: List[str] = []
     all_html: List[str] = []
 
-    for f in files:
-        p = Path(f)
-        if p.suffix.lower() == ".pdf":
-            plain = _extract_text_from_pdf(str(p), lang=lang, dpi=dpi)
-        elif p.suffix.lower() in {".docx", ".doc"}:
-            plain = _extract_text_from_docx(str(p))
-        else:
+    paths = [Path(f) for f in files]
+    for p in paths:
+        if p.suffix.lower() not in {".pdf", ".docx", ".doc"}:
             raise ValueError(f"Unsupported file type: {p.suffix}")
 
+    # No reader from the caller: load one in the background while native text is read
+    if reader is None and ocr_worker_count() <= 1 and any(p.suffix.lower() == ".pdf" for p in paths):
+        prewarm_ocr_engine(lang)
+
+    # One file at a time: PyMuPDF is not thread-safe, so a request never has
+    # two threads inside fitz (the OCR render thread only runs while this one
+    # waits on EasyOCR), and the shared reader is never called concurrently.
+    # Scanned pages still go to the OCR process pool when one is configured.
+    plains = [_extract_one(p, lang, dpi, reader, preprocess) for p in paths]
+
+    for p, plain in zip(paths, plains):
         if plain.strip():
             all_plain.append(plain)
             all_html.append(_wrap_html_paragraphs(plain))
@@ -163,9 +369,9 @@ def papers_to_clean_text(
             print(f"[WARNING] No text extracted from {p.name}")
 
     # Save plain text
-    concat_plain = "\n\n".join(all_plain).strip()
+    concat_plain = "\n\n".join(all_plain).strip() or "[EMPTY DOCUMENT: No text extracted]"
     concat_txt_path = out_dir / "reference_concat.txt"
-    concat_txt_path.write_text(concat_plain or "[EMPTY DOCUMENT: No text extracted]", encoding="utf-8")
+    concat_txt_path.write_text(concat_plain, encoding="utf-8")
 
     # Save HTML
     concat_html = "\n<hr/>\n".join(all_html)
@@ -189,4 +395,5 @@ def papers_to_clean_text(
     return {
         "concat_txt": str(concat_txt_path),
         "concat_html": str(concat_html_path),
+        "text": concat_plain,
     }
@@ -3,15 +3,21 @@
 """
 OCR utilities for mock exam paper extraction (math/science compatible).
 - EasyOCR (fast, general text)
-- Preprocessing for sharper OCR
-- Persistent cache for weights
+- Optional preprocessing (binarize/denoise); EasyOCR also preprocesses internally
+- Persistent cache for weights; optional per-thread reader pool (PAPERS_OCR_READERS)
 - Confidence filtering + math symbol normalization
+- In-memory LRU of OCR results keyed by preprocessed-image hash
+- Optional process pool for page-parallel OCR (PAPERS_OCR_WORKERS),
+  rendering PDF pages inside the workers
 """
 
 from __future__ import annotations
-from typing import Any, Dict, List, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 from pathlib import Path
-import os, tempfile, re
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+import hashlib, os, tempfile, re, threading
 
 # --- Third-party ---
 try:
@@ -29,10 +35,7 @@ try:
 except Exception:  # pragma: no cover
     Image = None  # type: ignore
 
-try:
-    import torch  # type: ignore
-except Exception:  # pragma: no cover
-    torch = None  # type: ignore
+# torch is imported lazily in _gpu_allowed (it is slow to import)
 
 
 # =========================
@@ -54,7 +57,9 @@ def _gpu_allowed(force_cpu: bool) -> bool:
     """Check if GPU can be used for EasyOCR."""
     if force_cpu:
         return False
-    if torch is None:
+    try:
+        import torch  # type: ignore
+    except Exception:
         return False
     try:
         return torch.cuda.is_available()
@@ -65,28 +70,86 @@ def _gpu_allowed(force_cpu: bool) -> bool:
 # =========================
 # EasyOCR init
 # =========================
-_EASYOCR_CACHE: Dict[Tuple[Tuple[str, ...], bool, str], Any] = {}
+# Up to PAPERS_OCR_READERS readers per key (each holds its own copy of the
+# weights, ~100-200 MB). A Reader runs one forward pass at a time, so threads
+# OCRing concurrently each lease the least-used one, adding readers up to the
+# cap; the default of 1 shares a single reader as before. Readers are never
+# released: once built, up to OCR_MAX_READERS models per key stay resident
+# for the life of the process, and a freed lease only makes its slot preferred.
+OCR_MAX_READERS = max(1, int(os.getenv("PAPERS_OCR_READERS", "1")))
+
+_ReaderKey = Tuple[Tuple[str, ...], bool, str]
+_EASYOCR_CACHE: Dict[_ReaderKey, List[List[Any]]] = {}  # key -> [[reader, live leases], ...]
+_EASYOCR_LOCK = threading.Lock()  # one construction (and download) at a time, even with a warm-up thread
+_READER_TLS = threading.local()   # this thread's leases, so repeat calls skip the lock
+_RELEASED_SLOTS: "deque[List[Any]]" = deque()  # ended leases, counted down under the lock
+
+
+class _ReaderLease:
+    """A thread's claim on a pooled reader; dropped with the thread's locals when it exits."""
+
+    def __init__(self, slot: List[Any]):
+        self.slot = slot
+        slot[1] += 1
+
+    def __del__(self):
+        # No lock here: a finalizer can run (GC, thread-local teardown) on a
+        # thread already holding _EASYOCR_LOCK. deque.append is atomic; the
+        # next init_easyocr_reader applies the decrement.
+        _RELEASED_SLOTS.append(self.slot)
+
+
+def _drain_released_slots() -> None:
+    """Apply queued lease releases; caller holds _EASYOCR_LOCK."""
+    while _RELEASED_SLOTS:
+        _RELEASED_SLOTS.popleft()[1] -= 1
+
 
 def init_easyocr_reader(lang_list: List[str] = ["en"], force_cpu: bool = True):
-    """Initialize and cache an EasyOCR Reader instance."""
-    import easyocr
+    """Initialize (or reuse) a pooled EasyOCR Reader for the calling thread."""
     storage_dir = _choose_storage_dir()
     use_gpu = _gpu_allowed(force_cpu=force_cpu)
 
     key = (tuple(lang_list), use_gpu, str(storage_dir))
-    if key in _EASYOCR_CACHE:
-        return _EASYOCR_CACHE[key]
-
-    reader = easyocr.Reader(
-        lang_list,
-        gpu=use_gpu,
-        model_storage_directory=str(storage_dir),
-        user_network_directory=str(storage_dir),
-        download_enabled=True,
-        verbose=False,
-    )
-    _EASYOCR_CACHE[key] = reader
-    return reader
+    leases = getattr(_READER_TLS, "leases", None)
+    if leases is None:
+        leases = _READER_TLS.leases = {}
+    if key in leases:
+        return leases[key].slot[0]
+
+    with _EASYOCR_LOCK:
+        _drain_released_slots()
+        pool = _EASYOCR_CACHE.setdefault(key, [])
+        slot = min(pool, key=lambda s: s[1], default=None)
+        if slot is None or (slot[1] > 0 and len(pool) < OCR_MAX_READERS):
+            import easyocr
+
+            reader = easyocr.Reader(
+                lang_list,
+                gpu=use_gpu,
+                model_storage_directory=str(storage_dir),
+                user_network_directory=str(storage_dir),
+                download_enabled=True,
+                verbose=False,
+                cudnn_benchmark=use_gpu,
+            )
+            slot = [reader, 0]
+            pool.append(slot)
+        leases[key] = _ReaderLease(slot)
+        return slot[0]
+
+
+def prewarm_ocr_engine(lang: str = "en") -> threading.Thread:
+    """Build the reader for `lang` on a daemon thread; get_ocr_engine later returns it (or waits for it)."""
+    def _warm() -> None:
+        try:
+            get_ocr_engine(lang)
+        except Exception as e:  # surfaced again by the real call if OCR is needed
+            print(f"[WARNING] OCR warm-up failed: {e}")
+
+    t = threading.Thread(target=_warm, name="ocr-warmup", daemon=True)
+    t.start()
+    return t
 
 
 # =========================
@@ -103,45 +166,83 @@ def get_ocr_engine(lang: str = "en"):
 # =========================
 # Preprocessing
 # =========================
-def _preprocess_for_ocr(img: Any) -> Any:
-    """Convert to grayscale, binarize, and denoise for sharper OCR."""
+# Median |Laplacian| above which a page counts as noisy. Clean renders of
+# digital PDFs score 0 (flat background); sensor noise of sigma ~2 scores ~4,
+# which the adaptive threshold's C=11 offset already absorbs.
+OCR_NOISE_THRESHOLD = 4.0
+
+
+def _noise_level(gray: Any) -> float:
+    """Cheap noise estimate: median |Laplacian| over a 2x-strided (not averaged) copy."""
+    return float(np.median(np.abs(cv2.Laplacian(gray[::2, ::2], cv2.CV_16S))))
+
+
+# Brightest-pixel spread across page tiles below which lighting counts as even
+# (a shadowed photo spans 100+ levels, a rendered or flatbed page ~0).
+OCR_EVEN_LIGHT_SPREAD = 40
+_LIGHT_TILE = 64  # tile side on the 4x-strided copy (256 px at full size)
+
+
+def _evenly_lit(gray: Any) -> bool:
+    """True when the page background (max per tile) is about equally bright everywhere."""
+    s = gray[::4, ::4]
+    h, w = (s.shape[0] // _LIGHT_TILE) * _LIGHT_TILE, (s.shape[1] // _LIGHT_TILE) * _LIGHT_TILE
+    if not h or not w:
+        return True
+    bg = s[:h, :w].reshape(h // _LIGHT_TILE, _LIGHT_TILE, w // _LIGHT_TILE, _LIGHT_TILE).max(axis=(1, 3))
+    return int(bg.max()) - int(np.percentile(bg, 5)) < OCR_EVEN_LIGHT_SPREAD
+
+
+def _preprocess_for_ocr(img: Any, binarize: str = "auto") -> Any:
+    """
+    Convert to grayscale, binarize, and denoise for sharper OCR.
+    binarize: "otsu" (one global threshold), "adaptive" (local, for uneven
+    lighting), or "auto" = Otsu when the page is evenly lit, else adaptive.
+    Non-local-means denoising (seconds per page) only runs on noisy pages.
+    """
     if cv2 is None or np is None:
         return img
 
+    # Go straight to one channel; 2-D input (csGRAY pixmaps) is used as is
     if isinstance(img, Image.Image):
-        img = np.array(img.convert("RGB"))
-
-    if img.ndim == 3 and img.shape[2] == 4:  # RGBA → RGB
-        img = cv2.cvtColor(img, cv2.COLOR_RGBA2RGB)
-
-    gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY) if img.ndim == 3 else img
-    th = cv2.adaptiveThreshold(
-        gray, 255,
-        cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
-        cv2.THRESH_BINARY, 35, 11
-    )
-    return cv2.fastNlMeansDenoising(th, h=15)
+        gray = np.asarray(img.convert("L"))
+    elif img.ndim == 3:
+        gray = cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY if img.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+    else:
+        gray = img
+    if binarize == "otsu" or (binarize == "auto" and _evenly_lit(gray)):
+        _, th = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY | cv2.THRESH_OTSU)
+    else:
+        th = cv2.adaptiveThreshold(
+            gray, 255,
+            cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+            cv2.THRESH_BINARY, 35, 11
+        )
+    if _noise_level(gray) <= OCR_NOISE_THRESHOLD:
+        return th
+    return cv2.fastNlMeansDenoising(th, h=15, templateWindowSize=5, searchWindowSize=13)
 
 
 # =========================
 # Math normalization
 # =========================
+# Single-char fixes go through translate first, so "−-" still ends up as "–"
+_MATH_CHAR_TABLE = str.maketrans({"×": "x", "−": "-"})
+_MATH_TOKENS = {
+    "--": "–",
+    "<=": "≤",
+    ">=": "≥",
+    "√ ": "√",
+    "∑ ": "∑",
+}
+_MATH_TOKEN_RE = re.compile("|".join(re.escape(k) for k in _MATH_TOKENS))
+_WS_RE = re.compile(r"\s+")
+
+
 def _normalize_math_text(text: str) -> str:
-    """Normalize common OCR misreads and math symbols."""
-    replacements = {
-        "O": "0",
-        "l": "1",
-        "×": "x",
-        "−": "-",
-        "--": "–",
-        "<=": "≤",
-        ">=": "≥",
-        "√ ": "√",
-        "∑ ": "∑",
-    }
-    for k, v in replacements.items():
-        text = text.replace(k, v)
-    return re.sub(r"\s+", " ", text).strip()
+    """Normalize common OCR misreads and math symbols (letters are left alone)."""
+    text = _MATH_TOKEN_RE.sub(lambda m: _MATH_TOKENS[m.group(0)], text.translate(_MATH_CHAR_TABLE))
+    return _WS_RE.sub(" ", text).strip()
 
 
 def _sort_by_coordinates(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
@@ -152,7 +253,75 @@ def _sort_by_coordinates(items: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
 # =========================
 # OCR runner (EasyOCR only)
 # =========================
-def ocr_image_easy(reader, image, conf_threshold: float = 0.3):
+_READTEXT_KWARGS: Dict[str, Any] = dict(
+    detail=1,
+    paragraph=True,
+    contrast_ths=0.05,
+    adjust_contrast=0.7,
+    text_threshold=0.6,
+    low_text=0.3,
+    width_ths=0.7,
+    slope_ths=0.2,
+    ycenter_ths=0.5,
+    height_ths=0.7,
+    mag_ratio=1.5,
+)
+
+
+# =========================
+# OCR result cache
+# =========================
+# Raw readtext results keyed by a hash of the preprocessed page, so blank
+# pages, repeated cover pages and re-uploads skip CRAFT+CRNN entirely.
+_OCR_CACHE: "OrderedDict[bytes, Any]" = OrderedDict()
+_OCR_CACHE_MAX = 10_000
+_OCR_CACHE_LOCK = threading.Lock()
+
+
+def _image_key(img: Any) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(repr(img.shape).encode("ascii"))
+    h.update(np.ascontiguousarray(img).data)
+    return h.digest()
+
+
+def _ocr_cache_get(key: bytes) -> Optional[Any]:
+    with _OCR_CACHE_LOCK:
+        res = _OCR_CACHE.get(key)
+        if res is not None:
+            _OCR_CACHE.move_to_end(key)
+        return res
+
+
+def _ocr_cache_put(key: bytes, res: Any) -> None:
+    with _OCR_CACHE_LOCK:
+        _OCR_CACHE[key] = res
+        _OCR_CACHE.move_to_end(key)
+        if len(_OCR_CACHE) > _OCR_CACHE_MAX:
+            _OCR_CACHE.popitem(last=False)
+
+
+def _collect_results(res, conf_threshold: float) -> List[Dict[str, Any]]:
+    """Normalize, confidence-filter and sort raw EasyOCR results."""
+    out: List[Dict[str, Any]] = []
+    for item in res:
+        try:
+            bbox, text, conf = item
+            text = _normalize_math_text(text or "")
+            if text and conf >= conf_threshold:
+                out.append({"bbox": bbox, "text": text, "conf": float(conf)})
+        except Exception:
+            continue
+    return _sort_by_coordinates(out)
+
+
+def ocr_image_easy(
+    reader,
+    image,
+    conf_threshold: float = 0.3,
+    binarize: str = "auto",
+    preprocess: bool = True,
+):
     """
     Run OCR on an image using EasyOCR.
     Returns list of dicts with bbox, text, and conf.
@@ -163,31 +332,214 @@ def ocr_image_easy(reader, image, conf_threshold: float = 0.3):
         raise RuntimeError("Pillow and numpy are required.")
 
     try:
-        img = _preprocess_for_ocr(image)
-        res = reader.readtext(
-            img,
-            detail=1,
-            paragraph=True,
-            contrast_ths=0.05,
-            adjust_contrast=0.7,
-            text_threshold=0.6,
-            low_text=0.3,
-            width_ths=0.7,
-            slope_ths=0.2,
-            ycenter_ths=0.5,
-            height_ths=0.7,
-            mag_ratio=1.5,
-        )
+        img = _preprocess_for_ocr(image, binarize) if preprocess else image
+        key = _image_key(img)
+        res = _ocr_cache_get(key)
+        if res is None:
+            res = reader.readtext(img, **_READTEXT_KWARGS)
+            _ocr_cache_put(key, res)
     except Exception as e:
         raise RuntimeError(f"EasyOCR failed: {e}")
 
-    out: List[Dict[str, Any]] = []
-    for item in res:
-        try:
-            bbox, text, conf = item
-            text = _normalize_math_text(text or "")
-            if text and conf >= conf_threshold:
-                out.append({"bbox": bbox, "text": text, "conf": float(conf)})
-        except Exception:
-            continue
-    return _sort_by_coordinates(out)
+    return _collect_results(res, conf_threshold)
+
+
+def _pad_to(im, height: int, width: int):
+    """`im` padded with white on the bottom/right to (height, width)."""
+    dh, dw = height - im.shape[0], width - im.shape[1]
+    if not dh and not dw:
+        return im
+    pad = [(0, dh), (0, dw)] + [(0, 0)] * (im.ndim - 2)
+    return np.pad(im, pad, mode="constant", constant_values=255)
+
+
+def ocr_images_easy(
+    reader,
+    images,
+    conf_threshold: float = 0.3,
+    batch_size: int = 8,
+    preprocess: bool = True,
+    binarize: str = "auto",
+):
+    """
+    Batched OCR over many page images with a single `readtext_batched` call.
+    Pages are padded with white (bottom/right) to a common shape so the
+    detector sees one stacked tensor without stretching mixed page sizes or
+    orientations; boxes keep their page coordinates. Pages already in the
+    OCR cache are left out of the batch.
+    preprocess=False hands the images to EasyOCR as they are (already
+    preprocessed, or raw pages). Returns one result list per input image, in order.
+    """
+    if reader is None:
+        raise RuntimeError("EasyOCR reader is None.")
+    if Image is None or np is None:
+        raise RuntimeError("Pillow and numpy are required.")
+    if not images:
+        return []
+
+    try:
+        imgs = [_preprocess_for_ocr(im, binarize) for im in images] if preprocess else list(images)
+        keys = [_image_key(im) for im in imgs]
+        res = [_ocr_cache_get(k) for k in keys]
+        # First occurrence of each uncached page; duplicates within the batch reuse it
+        misses = sorted({keys[i]: i for i in reversed(range(len(res))) if res[i] is None}.values())
+        if misses:
+            batch = [imgs[i] for i in misses]
+            n_height = max(im.shape[0] for im in batch)
+            n_width = max(im.shape[1] for im in batch)
+            # readtext_batched cv2.resizes every page to (n_width, n_height);
+            # padded pages already match, so none is distorted
+            batch = [_pad_to(im, n_height, n_width) for im in batch]
+            fresh = reader.readtext_batched(
+                batch,
+                n_width=n_width,
+                n_height=n_height,
+                batch_size=batch_size,
+                **_READTEXT_KWARGS,
+            )
+            by_key = {keys[i]: r for i, r in zip(misses, fresh)}
+            for k, r in by_key.items():
+                _ocr_cache_put(k, r)
+            res = [r if r is not None else by_key[k] for k, r in zip(keys, res)]
+    except Exception as e:
+        raise RuntimeError(f"EasyOCR failed: {e}")
+
+    return [_collect_results(r, conf_threshold) for r in res]
+
+
+# =========================
+# Page-parallel OCR (process pool)
+# =========================
+_OCR_POOL: Optional[ProcessPoolExecutor] = None
+_OCR_POOL_KEY: Optional[Tuple[str, int]] = None
+_OCR_POOL_LOCK = threading.Lock()
+_WORKER_READER = None
+
+
+def ocr_worker_count() -> int:
+    """Number of OCR worker processes requested via PAPERS_OCR_WORKERS (0 = in-process)."""
+    try:
+        return max(0, int(os.getenv("PAPERS_OCR_WORKERS", "0")))
+    except ValueError:
+        return 0
+
+
+def _init_worker(lang: str) -> None:
+    """Pool initializer: build one EasyOCR reader per child process."""
+    global _WORKER_READER
+    from .bootstrap import ensure_easyocr_weights
+    _WORKER_READER = ensure_easyocr_weights(lang)
+
+
+def _ocr_shared_page(job: Tuple[str, Tuple[int, ...], str, float]) -> List[Dict[str, Any]]:
+    """Run OCR in a worker on a page image stored in shared memory."""
+    shm_name, shape, dtype, conf_threshold = job
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        img = np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf).copy()
+    finally:
+        shm.close()
+    return ocr_image_easy(_WORKER_READER, img, conf_threshold=conf_threshold)
+
+
+# Longest rendered side for OCR pages: A4 at 300 dpi. Larger sheets (A3,
+# posters) get a lower effective dpi instead of ever-bigger bitmaps.
+OCR_MAX_SIDE_PX = 3508
+
+
+def ocr_page_dpi(page: Any, dpi: int) -> float:
+    """Effective render dpi for `page`: `dpi`, capped so the long side stays <= OCR_MAX_SIDE_PX."""
+    long_side_pt = max(page.rect.width, page.rect.height) or 1
+    return min(dpi, OCR_MAX_SIDE_PX * 72 / long_side_pt)
+
+
+def _ocr_pdf_page(job: Tuple[str, int, int, float, str, bool]) -> List[Dict[str, Any]]:
+    """Render and OCR one PDF page in a worker (documents can't be shared, so reopen it)."""
+    import fitz  # PyMuPDF
+
+    path, page_idx, dpi, conf_threshold, binarize, preprocess = job
+    with fitz.open(path) as doc:
+        page = doc[page_idx]
+        zoom = ocr_page_dpi(page, dpi) / 72
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    gray = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    return ocr_image_easy(
+        _WORKER_READER, gray, conf_threshold=conf_threshold, binarize=binarize, preprocess=preprocess,
+    )
+
+
+def get_ocr_pool(lang: str = "en", max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """Return the process-wide OCR pool, creating it on first use."""
+    global _OCR_POOL, _OCR_POOL_KEY
+    workers = max_workers or ocr_worker_count() or (os.cpu_count() or 1)
+    with _OCR_POOL_LOCK:
+        if _OCR_POOL is None or _OCR_POOL_KEY != (lang, workers):
+            if _OCR_POOL is not None:
+                _OCR_POOL.shutdown(wait=False)
+            _OCR_POOL = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(lang,),
+            )
+            _OCR_POOL_KEY = (lang, workers)
+        return _OCR_POOL
+
+
+def ocr_images_parallel(
+    images,
+    lang: str = "en",
+    conf_threshold: float = 0.3,
+    max_workers: Optional[int] = None,
+) -> List[List[Dict[str, Any]]]:
+    """
+    OCR many page images across worker processes (one reader per worker).
+    Pages are handed over via shared memory to avoid pickling large arrays.
+    Returns one result list per input image, in order.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required.")
+    if not images:
+        return []
+
+    pool = get_ocr_pool(lang, max_workers)
+    segments: List[shared_memory.SharedMemory] = []
+    try:
+        jobs = []
+        for img in images:
+            arr = np.ascontiguousarray(img)
+            shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+            segments.append(shm)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            jobs.append((shm.name, arr.shape, arr.dtype.str, conf_threshold))
+        return list(pool.map(_ocr_shared_page, jobs, chunksize=4))
+    finally:
+        for shm in segments:
+            shm.close()
+            shm.unlink()
+
+
+def ocr_pdf_pages_parallel(
+    path: str,
+    page_indices: List[int],
+    lang: str = "en",
+    dpi: int = 300,
+    conf_threshold: float = 0.3,
+    max_workers: Optional[int] = None,
+    binarize: str = "auto",
+    preprocess: bool = True,
+) -> List[List[Dict[str, Any]]]:
+    """
+    OCR the given pages of a PDF across worker processes. Each worker
+    rasterizes, preprocesses and reads its own page, so rendering runs in
+    parallel too and no page images are copied between processes.
+    Returns one result list per page index, in order.
+    """
+    if np is None:
+        raise RuntimeError("numpy is required.")
+    if not page_indices:
+        return []
+
+    pool = get_ocr_pool(lang, max_workers)
+    jobs = [(path, i, dpi, conf_threshold, binarize, preprocess) for i in page_indices]
+    return list(pool.map(_ocr_pdf_page, jobs))
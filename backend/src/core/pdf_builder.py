@@ -9,12 +9,19 @@ ReportLab-only PDF builder for mock exam papers (Unicode math mode).
 - Styles for sections, questions, answers, marks.
 - MCQ options a./b./c./d. are printed line by line.
 - Markdown-like tables |a|b| → rendered as ReportLab tables (works in both question and answer key).
+- Batch builds can fan out over worker processes (MOCKGEN_PDF_WORKERS).
 """
 
-from typing import Optional, List, Union
+from typing import Any, Dict, Optional, List, Tuple, Union
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import functools
+import os
 import re
+import threading
 
+from reportlab import rl_config
 from reportlab.lib.pagesizes import A4
 from reportlab.platypus import (
     SimpleDocTemplate, Paragraph, Spacer, PageBreak,
@@ -26,13 +33,21 @@ from reportlab.lib import colors
 from reportlab.pdfbase import pdfmetrics
 from reportlab.pdfbase.ttfonts import TTFont
 
+from .llm_mockgen import decode_unicode_escapes  # shared U+xxxx decoder (precompiled regex)
+
+# Skip ReportLab's per-shape argument validation (inputs are built here, not user-drawn)
+rl_config.shapeChecking = 0
+
 # ---------------- Register Unicode font ----------------
+# Only the name is settled at import; TTFont parses the whole file, so the
+# font itself is registered on the first build (_ensure_font).
 FONT_PATH = Path(__file__).resolve().parent.parent / "assets" / "fonts" / "STIXTwoMath-Regular.ttf"
-if FONT_PATH.exists():
-    pdfmetrics.registerFont(TTFont("STIXTwoMath", str(FONT_PATH)))
-    DEFAULT_FONT = "STIXTwoMath"
-else:
-    DEFAULT_FONT = "Helvetica"  # fallback
+DEFAULT_FONT = "STIXTwoMath" if FONT_PATH.exists() else "Helvetica"  # fallback
+
+@functools.lru_cache(maxsize=1)
+def _ensure_font() -> None:
+    if DEFAULT_FONT != "Helvetica":
+        pdfmetrics.registerFont(TTFont(DEFAULT_FONT, str(FONT_PATH)))
 
 # ---------------- Layout constants ----------------
 LEFT_MARGIN  = 56
@@ -42,6 +57,12 @@ BOTTOM_MARGIN= 64
 BASE_FONTSIZE = 12
 BASE_LEADING  = 16
 
+# Page furniture positions, computed once rather than per page draw
+_PAGE_W, _PAGE_H = A4
+_RIGHT_X       = _PAGE_W - RIGHT_MARGIN
+_HEADER_Y      = _PAGE_H - 42
+_HEADER_LINE_Y = _PAGE_H - 46
+
 # ---------------- Palette ----------------
 ACCENT         = colors.HexColor("#1a3d7c")
 SECTION        = colors.HexColor("#4d2c91")
@@ -176,44 +197,49 @@ style_blockmath = ParagraphStyle(
     spaceAfter=6,
 )
 
+# Shared by every table; Table only reads the commands
+_TABLE_STYLE = TableStyle([
+    ("GRID", (0,0), (-1,-1), 0.5, colors.black),
+    ("FONTNAME", (0,0), (-1,-1), DEFAULT_FONT),
+    ("FONTSIZE", (0,0), (-1,-1), BASE_FONTSIZE),
+    ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
+    ("ALIGN", (0,0), (-1,-1), "CENTER"),
+])
+
 # ---------------- Footer & Header ----------------
 def _footer(canvas, doc):
     canvas.saveState()
     canvas.setStrokeColor(HAIRLINE)
     canvas.setLineWidth(0.5)
-    canvas.line(LEFT_MARGIN, 52, A4[0]-RIGHT_MARGIN, 52)
+    canvas.line(LEFT_MARGIN, 52, _RIGHT_X, 52)
     canvas.setFont(DEFAULT_FONT, 9)
     canvas.setFillColor(colors.black)
     canvas.drawString(LEFT_MARGIN, 40, "Mock Paper Generator")
-    canvas.drawRightString(A4[0]-RIGHT_MARGIN, 40, f"Page {doc.page}")
+    canvas.drawRightString(_RIGHT_X, 40, f"Page {doc.page}")
     canvas.restoreState()
 
 def _header(canvas, doc, title: str):
     canvas.saveState()
     canvas.setFillColor(ACCENT)
     canvas.setFont(DEFAULT_FONT, 10.5)
-    canvas.drawString(LEFT_MARGIN, A4[1]-42, title)
+    canvas.drawString(LEFT_MARGIN, _HEADER_Y, title)
     canvas.setStrokeColor(ACCENT)
     canvas.setLineWidth(2)
-    canvas.line(LEFT_MARGIN, A4[1]-46, A4[0]-RIGHT_MARGIN, A4[1]-46)
+    canvas.line(LEFT_MARGIN, _HEADER_LINE_Y, _RIGHT_X, _HEADER_LINE_Y)
     canvas.restoreState()
 
-# ---------------- Unicode escape decoder ----------------
-def decode_unicode_escapes(text: str) -> str:
-    """Decode sequences like 'U+03C0' into real Unicode characters."""
-    if not text:
-        return text
-    def repl(m):
-        try:
-            return chr(int(m.group(1), 16))
-        except Exception:
-            return m.group(0)
-    return re.sub(r"U\+([0-9A-Fa-f]{4,6})", repl, text)
+def _draw_furniture(canvas, doc, title: str):
+    _header(canvas, doc, title)
+    _footer(canvas, doc)
 
 # ---------------- Math prettifier ----------------
 _SUPERSCRIPT_MAP = str.maketrans("0123456789+-=", "⁰¹²³⁴⁵⁶⁷⁸⁹⁺⁻⁼")
 _SUBSCRIPT_MAP   = str.maketrans("0123456789+-=", "₀₁₂₃₄₅₆₇₈₉₊₋₌")
 
+_SUP_RE = re.compile(r"\^([0-9+\-=]+)")
+_SUB_RE = re.compile(r"_([0-9+\-=]+)")
+
+@functools.lru_cache(maxsize=4096)  # options, marks lines and table cells repeat a lot
 def prettify_ascii_math(expr: str) -> str:
     """Convert ASCII-safe math (x^2, H2O, pi, theta) to Unicode pretty math."""
     expr = decode_unicode_escapes(expr)
@@ -222,8 +248,8 @@ def prettify_ascii_math(expr: str) -> str:
     expr = expr.replace("sqrt", "√")
     expr = expr.replace("exp", "e")  
 
-    expr = re.sub(r"\^([0-9+\-=]+)", lambda m: m.group(1).translate(_SUPERSCRIPT_MAP), expr)
-    expr = re.sub(r"_([0-9+\-=]+)", lambda m: m.group(1).translate(_SUBSCRIPT_MAP), expr)
+    expr = _SUP_RE.sub(lambda m: m.group(1).translate(_SUPERSCRIPT_MAP), expr)
+    expr = _SUB_RE.sub(lambda m: m.group(1).translate(_SUBSCRIPT_MAP), expr)
 
     expr = expr.replace("pi", "π").replace("theta", "θ")
     expr = expr.replace("{", "").replace("}", "")
@@ -231,24 +257,112 @@ def prettify_ascii_math(expr: str) -> str:
 
     return expr
 
+# Paragraph text is XML: escape &, <, > so "a<b" or "AT&T" render literally
+# instead of failing the parse (table cells are plain strings, not markup)
+_XML_ESCAPE = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+@functools.lru_cache(maxsize=4096)
+def _paragraph_text(line: str) -> str:
+    """prettify_ascii_math output, escaped for a Paragraph."""
+    return prettify_ascii_math(line).translate(_XML_ESCAPE)
+
+@functools.lru_cache(maxsize=8192)
+def _paragraph_frags(line: str, style: ParagraphStyle) -> list:
+    """Parsed fragments of a body line; Paragraph() re-runs its XML parser on every call."""
+    return Paragraph(_paragraph_text(line), style).frags
+
+def _paragraph(line: str, style: ParagraphStyle) -> Paragraph:
+    """Fresh Paragraph for `line`, built from cached fragments (not mutated by wrap/split)."""
+    return Paragraph(_paragraph_text(line), style, frags=_paragraph_frags(line, style))
+
+# One table for every OCR/LLM substitution (π, θ, √, ∑, ∫, ∞ pass through untouched)
+_OCR_TRANS = str.maketrans({
+    "•": ".", "·": ".", "×": "*",
+    "−": "-", "–": "-", "—": "-",
+    "⁄": "/", "°": " deg",
+    **dict.fromkeys("■▮█▪▫◼◾◽", "*"),
+})
+
 def _ocr_normalize(s: str) -> str:
     """Normalize OCR/LLM quirks into safe text/math symbols."""
-    s = decode_unicode_escapes(s)
-    s = (s.replace("•", ".")
-           .replace("·", ".")
-           .replace("×", "*")
-           .replace("−", "-").replace("–", "-").replace("—", "-")
-           .replace("⁄", "/").replace("°", " deg"))
-    keep = {"π", "θ", "√", "∑", "∫", "∞"}
-    s2 = []
-    for ch in s:
-        if ch in keep:
-            s2.append(ch)
-        elif ch in {"■", "▮", "█", "▪", "▫", "◼", "◾", "◽"}:
-            s2.append("*")
+    return decode_unicode_escapes(s).translate(_OCR_TRANS)
+
+# ---------------- Line patterns ----------------
+# One anchored scan per (stripped) line; alternatives are tried in priority
+# order and the matching group's name selects the tag.
+_LINE_RE = re.compile(
+    r"(?P<section>\d+\.\s*[A-Za-z])"
+    r"|(?P<question>q\s*\d+|\(?\d+\)?[.)])"
+    r"|(?P<option>[a-d]\.)"
+    r"|(?P<marks>.*?mark)"
+    r"|(?P<table>\|.+\|$)",
+    re.I,
+)
+_TABLE_ROW_RE  = re.compile(r"^\|.+\|$")
+_ANSWER_NUM_RE = re.compile(r"^\s*(?:\d+\s*[.)])")
+_ANSWER_OPT_RE = re.compile(r"^\s*(?:[a-d][.)])\s*", re.I)
+
+# First-character dispatch in front of _LINE_RE: "a." .. "d." can only be an
+# option, and section/question/table heads start with a digit, "q", "(" or
+# "|", so any other line can at most be a marks line
+_OPTION_HEADS = frozenset("abcdABCD")
+_LINE_HEADS   = frozenset("0123456789qQ(|")
+_MARK_RE      = re.compile("mark", re.I)
+
+# ---------------- Line classification ----------------
+_T_EMPTY, _T_SECTION, _T_QUESTION, _T_OPTION, _T_MARKS, _T_TABLE, _T_ANSWER, _T_BODY = range(8)
+
+_GROUP_TAGS = {
+    "section":  _T_SECTION,
+    "question": _T_QUESTION,
+    "option":   _T_OPTION,
+    "marks":    _T_MARKS,
+    "table":    _T_TABLE,
+}
+
+_TAG_STYLES = {
+    _T_SECTION:  style_section,
+    _T_QUESTION: style_question,
+    _T_OPTION:   style_option,
+    _T_MARKS:    style_marks,
+    _T_ANSWER:   style_answer,
+    _T_BODY:     style_body,
+}
+
+def _classify_lines(lines: List[str], is_answer_key: bool) -> Tuple[List[int], List[str]]:
+    """
+    One pass over the lines: parallel (tag, payload) lists, payload being the
+    stripped line to render. All regex work happens here; the build loop only
+    dispatches on tags. Consecutive _T_TABLE rows form one table.
+    """
+    tags: List[int] = []
+    payload: List[str] = []
+    prev = _T_EMPTY
+    match_line = _LINE_RE.match
+    find_mark = _MARK_RE.search
+    for raw in lines:
+        line = raw.strip()
+        if not line:
+            tag = _T_EMPTY
+        elif prev == _T_TABLE and _TABLE_ROW_RE.match(line):
+            tag = _T_TABLE  # an open table keeps every |row|, even ones mentioning marks
+        elif line[1:2] == "." and line[0] in _OPTION_HEADS:
+            tag = _T_OPTION
+        elif line[0] in _LINE_HEADS and (m := match_line(line)) is not None:
+            tag = _GROUP_TAGS[m.lastgroup]
+        elif line[0] not in _LINE_HEADS and find_mark(line):
+            tag = _T_MARKS
+        elif is_answer_key:
+            # For answer keys: keep question number only on the first line of each answer
+            tag = _T_ANSWER
+            if not _ANSWER_NUM_RE.match(line):
+                line = _ANSWER_OPT_RE.sub("", line, count=1)
         else:
-            s2.append(ch)
-    return "".join(s2)
+            tag = _T_BODY
+        tags.append(tag)
+        payload.append(line)
+        prev = tag
+    return tags, payload
 
 # ---------------- Build ----------------
 def build_mockpaper_pdf(
@@ -258,20 +372,21 @@ def build_mockpaper_pdf(
     source_name: Optional[str] = None,
     is_answer_key: bool = False,
 ):
-    raw_lines = text.replace("\r\n", "\n").replace("\r", "\n").splitlines()
-    raw_lines = [_ocr_normalize(s) for s in raw_lines]
-    lines = raw_lines
+    _ensure_font()
+
+    # Normalize the whole document once, then split (splitlines handles \r\n and \r)
+    lines = _ocr_normalize(text).splitlines()
 
     story: List[Union[Flowable, Paragraph]] = []
 
     story.append(Spacer(1, 22))
     # Differentiate cover page for QP vs Answer key
     if is_answer_key:
-        story.append(Paragraph(f"{title} — Answer Key", style_cover_title))
+        story.append(Paragraph(f"{title.translate(_XML_ESCAPE)} — Answer Key", style_cover_title))
     else:
-        story.append(Paragraph(f"{title} — Question Paper", style_cover_title))
+        story.append(Paragraph(f"{title.translate(_XML_ESCAPE)} — Question Paper", style_cover_title))
     if source_name:
-        story.append(Paragraph(source_name, style_cover_sub))
+        story.append(Paragraph(source_name.translate(_XML_ESCAPE), style_cover_sub))
     story.append(Paragraph("Instructions", style_instr_head))
     story.append(Paragraph(
         "Answer all questions. Show full working. Round off appropriately.",
@@ -279,86 +394,30 @@ def build_mockpaper_pdf(
     ))
     story.append(PageBreak())
 
-    i = 0
-    q_counter = 0
-    while i < len(lines):
-        line = lines[i].strip()
+    tags, payload = _classify_lines(lines, is_answer_key)
 
-        if not line:
-            story.append(Spacer(1, 8))
-            i += 1
-            continue
+    i, n = 0, len(tags)
+    while i < n:
+        tag = tags[i]
 
-        if re.match(r"^\s*\d+\.\s*[A-Za-z]", line) and not line.lower().startswith(("q", "q1", "q2")):
-            story.append(Spacer(1, 6))
-            story.append(Paragraph(prettify_ascii_math(line), style_section))
-            i += 1
-            continue
-
-        if re.match(r"^\s*(?:q\s*\d+|\(?\d+\)?[.)])", line, flags=re.I):
-            q_counter += 1
-            story.append(Paragraph(prettify_ascii_math(line), style_question))
-            i += 1
-            continue
-
-        if re.match(r"^[a-d]\.", line, flags=re.I):
+        if tag == _T_TABLE:
             j = i
-            while j < len(lines) and re.match(r"^[a-d]\.", lines[j].strip(), flags=re.I):
-                story.append(Paragraph(prettify_ascii_math(lines[j].strip()), style_option))
+            while j < n and tags[j] == _T_TABLE:
                 j += 1
+            table_lines = [
+                [prettify_ascii_math(c.strip()) for c in row.strip("|").split("|")]
+                for row in payload[i:j]
+            ]
+            story.append(Table(table_lines, style=_TABLE_STYLE))
             i = j
             continue
 
-        if "mark" in line.lower():
-            story.append(Paragraph(prettify_ascii_math(line), style_marks))
-            i += 1
-            continue
-
-        if is_answer_key:
-            if re.match(r"^\|.+\|$", line):
-                table_lines = []
-                while i < len(lines) and re.match(r"^\|.+\|$", lines[i].strip()):
-                    row = [prettify_ascii_math(c.strip()) for c in lines[i].strip().strip("|").split("|")]
-                    table_lines.append(row)
-                    i += 1
-                tbl = Table(table_lines, style=TableStyle([
-                    ("GRID", (0,0), (-1,-1), 0.5, colors.black),
-                    ("FONTNAME", (0,0), (-1,-1), DEFAULT_FONT),
-                    ("FONTSIZE", (0,0), (-1,-1), BASE_FONTSIZE),
-                    ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-                    ("ALIGN", (0,0), (-1,-1), "CENTER"),
-                ]))
-                story.append(tbl)
-                continue
-
-            # For answer keys: keep question number only on the first line of each answer
-            if re.match(r"^\s*(?:\d+\s*[.)])", line):
-                # First line of answer → keep number
-                story.append(Paragraph(prettify_ascii_math(line), style_answer))
-            else:
-                # Subsequent lines → strip any leftover numbering
-                clean_line = re.sub(r"^\s*(?:[a-d][.)])\s*", "", line, flags=re.I)
-                story.append(Paragraph(prettify_ascii_math(clean_line), style_answer))
-            i += 1
-            continue
-
-        if re.match(r"^\|.+\|$", line):
-            table_lines = []
-            while i < len(lines) and re.match(r"^\|.+\|$", lines[i].strip()):
-                row = [prettify_ascii_math(c.strip()) for c in lines[i].strip().strip("|").split("|")]
-                table_lines.append(row)
-                i += 1
-            tbl = Table(table_lines, style=TableStyle([
-                ("GRID", (0,0), (-1,-1), 0.5, colors.black),
-                ("FONTNAME", (0,0), (-1,-1), DEFAULT_FONT),
-                ("FONTSIZE", (0,0), (-1,-1), BASE_FONTSIZE),
-                ("VALIGN", (0,0), (-1,-1), "MIDDLE"),
-                ("ALIGN", (0,0), (-1,-1), "CENTER"),
-            ]))
-            story.append(tbl)
-            continue
-
-        story.append(Paragraph(prettify_ascii_math(line), style_body))
+        if tag == _T_EMPTY:
+            story.append(Spacer(1, 8))
+        else:
+            if tag == _T_SECTION:
+                story.append(Spacer(1, 6))
+            story.append(_paragraph(payload[i], _TAG_STYLES[tag]))
         i += 1
 
     out = Path(out_path); out.parent.mkdir(parents=True, exist_ok=True)
@@ -369,10 +428,53 @@ def build_mockpaper_pdf(
         leftMargin=LEFT_MARGIN, rightMargin=RIGHT_MARGIN
     )
 
-    doc.build(
-        story,
-        onFirstPage=lambda c, d: (_header(c, d, title), _footer(c, d)),
-        onLaterPages=lambda c, d: (_header(c, d, title), _footer(c, d)),
-    )
+    furniture = functools.partial(_draw_furniture, title=title)
+    doc.build(story, onFirstPage=furniture, onLaterPages=furniture)
 
     return str(out)
+
+
+# ---------------- Batch build (process pool) ----------------
+# ReportLab layout is pure Python and GIL-bound, so papers and answer keys
+# only build in parallel across processes. The pool is spawned once, sized by
+# the first configured worker count, and never resized or shut down (spawning
+# costs ~2 s, and another request may still be mapping over it).
+_PDF_POOL: Optional[ProcessPoolExecutor] = None
+_PDF_POOL_LOCK = threading.Lock()
+
+
+def pdf_worker_count() -> int:
+    """Number of PDF worker processes requested via MOCKGEN_PDF_WORKERS (0 = in-process)."""
+    try:
+        return max(0, int(os.getenv("MOCKGEN_PDF_WORKERS", "0")))
+    except ValueError:
+        return 0
+
+
+def _get_pdf_pool(workers: int) -> ProcessPoolExecutor:
+    global _PDF_POOL
+    with _PDF_POOL_LOCK:
+        if _PDF_POOL is None:
+            _PDF_POOL = ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn"))
+        return _PDF_POOL
+
+
+def _build_job(job: Dict[str, Any]) -> str:
+    return build_mockpaper_pdf(**job)
+
+
+def build_mockpaper_pdf_batch(
+    jobs: List[Dict[str, Any]],
+    max_workers: Optional[int] = None,
+) -> List[str]:
+    """
+    Build several PDFs, each job being build_mockpaper_pdf keyword arguments.
+    Runs across worker processes when more than one is configured
+    (max_workers, else MOCKGEN_PDF_WORKERS); otherwise builds in order here.
+    Returns the output paths in job order.
+    """
+    workers = max_workers if max_workers is not None else pdf_worker_count()
+    # len(jobs) only decides whether the pool is worth using; it never sizes it
+    if min(workers, len(jobs)) <= 1:
+        return [build_mockpaper_pdf(**job) for job in jobs]
+    return list(_get_pdf_pool(workers).map(_build_job, jobs))
@@ -7,13 +7,15 @@ End-to-end pipeline for mock exam paper generation.
 - Export each as paired styled PDFs (via HTML + KaTeX + Playwright)
 """
 
-from typing import Optional, Tuple, List
+from typing import Any, Optional, Tuple, List
 from pathlib import Path
+import os
+import shutil
 import tempfile
 
 from .llm_mockgen import generate_mock_papers
 from .mock_upload import papers_to_clean_text
-from .pdf_builder import build_mockpaper_pdf
+from .pdf_builder import build_mockpaper_pdf_batch
 
 
 def run_pipeline_end_to_end(
@@ -25,6 +27,7 @@ def run_pipeline_end_to_end(
     difficulty: str = "same",
     num_mocks: int = 1,
     out_dir: Optional[str] = None,       # now optional
+    reader: Optional[Any] = None,        # prebuilt EasyOCR reader (e.g. from app startup)
 ) -> Tuple[List[str], str, str]:
     """
     End-to-end pipeline:
@@ -41,6 +44,7 @@ def run_pipeline_end_to_end(
         difficulty: "easy" | "same" | "harder"
         num_mocks: number of mock paper versions (1–3)
         out_dir: output directory for PDFs and text. If None, use a temp dir.
+        reader: prebuilt EasyOCR reader. If None, the memoized bootstrap reader is used.
 
     Returns:
         (list of generated PDF paths, concat_txt_path, out_dir)
@@ -54,22 +58,28 @@ def run_pipeline_end_to_end(
 
     # --- Save uploads to disk
     saved_paths: List[str] = []
+    out_str = str(out)  # plain string joins in the loop; no Path object per upload
     for f in files:
         if hasattr(f, "read"):  # file-like (UploadFile, BytesIO, etc.)
             name_hint = getattr(f, "filename", getattr(f, "name", "upload.pdf"))
-            ext = Path(name_hint).suffix.lower()
-            tmp_path = out / f"upload_{len(saved_paths)}{ext}"
-            tmp_path.write_bytes(f.read())
-            saved_paths.append(str(tmp_path))
+            ext = os.path.splitext(name_hint)[1].lower()
+            tmp_path = os.path.join(out_str, f"upload_{len(saved_paths)}{ext}")
+            # Stream in 1 MiB chunks; UploadFile's sync handle is .file, text handles expose .buffer
+            src = getattr(f, "file", f)
+            src = getattr(src, "buffer", src)
+            with open(tmp_path, "wb") as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+            saved_paths.append(tmp_path)
         else:  # already a path
             saved_paths.append(str(f))
 
     if not saved_paths:
         raise ValueError("No input files provided for processing.")
     
-    # --- Ensure EasyOCR weights and cache
-    from .bootstrap import ensure_easyocr_weights
-    reader = ensure_easyocr_weights()
+    # --- Ensure EasyOCR weights and cache (reuse the caller's reader if given)
+    if reader is None:
+        from .bootstrap import ensure_easyocr_weights
+        reader = ensure_easyocr_weights(language)
     print(f"[DEBUG] EasyOCR initialized with model dir={reader.model_storage_directory}, "
           f"user dir={reader.user_network_directory}")
 
@@ -79,6 +89,7 @@ def run_pipeline_end_to_end(
         out_dir=str(out),
         lang=language,
         dpi=dpi,
+        reader=reader,
     )
 
     # Make sure concat_txt exists
@@ -90,7 +101,8 @@ def run_pipeline_end_to_end(
     if not concat_txt_path:
         raise ValueError("papers_to_clean_text did not return a 'concat_txt' key or equivalent.")
 
-    reference_text = Path(concat_txt_path).read_text(encoding="utf-8")
+    # The extractor hands back the text it wrote; only fall back to the file
+    reference_text = extract_result.get("text") or Path(concat_txt_path).read_text(encoding="utf-8")
     if not reference_text.strip():
         raise ValueError("No text extracted from uploaded documents.")
 
@@ -106,26 +118,17 @@ def run_pipeline_end_to_end(
         raise ValueError("Mock paper generation returned no results.")
 
     # --- Export to PDFs (via HTML + KaTeX + Playwright)
-    generated_paths: List[str] = []
+    # (papers and answer keys build in worker processes if MOCKGEN_PDF_WORKERS > 1)
+    jobs = []
     for idx, (paper_text, answer_text) in enumerate(mock_pairs, start=1):
-        paper_pdf = out / f"mock_{idx}.pdf"
-        answers_pdf = out / f"mock_{idx}_answers.pdf"
-
-        build_mockpaper_pdf(
-            text=paper_text,
-            out_path=str(paper_pdf),
-            title=f"Mock Exam Paper {idx}",
-            source_name="Reference Upload",
-            is_answer_key=False,
-        )
-        build_mockpaper_pdf(
-            text=answer_text,
-            out_path=str(answers_pdf),
-            title=f"Mock Exam Paper {idx}",
-            source_name="Reference Upload",
-            is_answer_key=True,
-        )
-
-        generated_paths.extend([str(paper_pdf), str(answers_pdf)])
+        for text, suffix, is_answer_key in ((paper_text, "", False), (answer_text, "_answers", True)):
+            jobs.append(dict(
+                text=text,
+                out_path=str(out / f"mock_{idx}{suffix}.pdf"),
+                title=f"Mock Exam Paper {idx}",
+                source_name="Reference Upload",
+                is_answer_key=is_answer_key,
+            ))
+    generated_paths: List[str] = build_mockpaper_pdf_batch(jobs)
 
     return generated_paths, concat_txt_path, str(out)
@@ -3,45 +3,108 @@
 """
 Rendering utilities for exam papers.
 - PDF → PNG per page (for OCR on scanned math/printed papers)
+- PDF → in-memory grayscale arrays (feed EasyOCR without PNG encode/decode)
 - DOCX → PDF → PNG (optional, requires docx2pdf on Windows/macOS or LibreOffice on Linux)
 """
 
 from __future__ import annotations
 from pathlib import Path
-from typing import List
+from typing import List, Optional, Tuple, TYPE_CHECKING
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+import importlib.util
 import subprocess
 import shutil
 
+if TYPE_CHECKING:  # pragma: no cover
+    import numpy as np
+
+
+DEFAULT_RENDER_DPI = 180  # OCR gains little above ~180 dpi; pixels cost memory
+
+# Page PNGs are OCR intermediates: written once, read once. With Pillow they
+# are encoded at zlib level 1 (~20% faster, ~25% larger) instead of MuPDF's default.
+_HAS_PIL = importlib.util.find_spec("PIL") is not None
+PNG_COMPRESS_LEVEL = 1
+
 
 # ---------------------------
 # PDF → PNG (PyMuPDF)
 # ---------------------------
-def pdf_to_png(pdf_path: str | Path, out_dir: str | Path, dpi: int = 220) -> List[Path]:
-    """
-    Rasterize a PDF to PNG pages using PyMuPDF at a target DPI.
-    """
-    from fitz import open as fitz_open, Matrix
-
-    out = Path(out_dir)
-    out.mkdir(parents=True, exist_ok=True)
-
-    doc = fitz_open(str(pdf_path))
-    imgs: List[Path] = []
+def _iter_gray_pixmaps(pdf_path: str | Path, dpi: int, start: int = 0, stop: Optional[int] = None):
+    """Yield 8-bit grayscale, alpha-free pixmaps for pages [start, stop) (default: every page)."""
+    from fitz import open as fitz_open, Matrix, csGRAY
 
     zoom = dpi / 72.0
     mat = Matrix(zoom, zoom)
+    with fitz_open(str(pdf_path)) as doc:
+        for i in range(start, doc.page_count if stop is None else stop):
+            yield doc[i].get_pixmap(matrix=mat, colorspace=csGRAY, alpha=False)
+
 
-    for i, page in enumerate(doc, 1):
-        pix = page.get_pixmap(matrix=mat)
-        p = out / f"page_{i:03d}.png"
-        pix.save(str(p))
+def _png_segment(job: Tuple[str, str, int, int, Optional[int]]) -> List[Path]:
+    """Render pages [start, stop) to page_NNN.png files (runs in a worker when parallel)."""
+    pdf_path, out_dir, dpi, start, stop = job
+    imgs: List[Path] = []
+    for i, pix in enumerate(_iter_gray_pixmaps(pdf_path, dpi, start, stop), start + 1):
+        p = Path(out_dir) / f"page_{i:03d}.png"
+        if _HAS_PIL:
+            pix.pil_save(str(p), format="PNG", compress_level=PNG_COMPRESS_LEVEL)
+        else:
+            pix.save(str(p))
         imgs.append(p)
+    return imgs
+
+
+def pdf_to_png(
+    pdf_path: str | Path,
+    out_dir: str | Path,
+    dpi: int = DEFAULT_RENDER_DPI,
+    workers: int = 1,
+) -> List[Path]:
+    """
+    Rasterize a PDF to grayscale PNG pages using PyMuPDF at a target DPI.
+    With workers > 1 the pages are split into contiguous ranges rendered by
+    separate processes (PyMuPDF is not thread-safe, and holds the GIL).
+    """
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    if workers > 1:
+        from fitz import open as fitz_open
+
+        with fitz_open(str(pdf_path)) as doc:
+            n = doc.page_count
+        workers = min(workers, n)
+    if workers > 1:
+        bounds = [n * k // workers for k in range(workers + 1)]
+        jobs = [(str(pdf_path), str(out), dpi, a, b) for a, b in zip(bounds, bounds[1:])]
+        with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as ex:
+            imgs = [p for seg in ex.map(_png_segment, jobs) for p in seg]
+    else:
+        imgs = _png_segment((str(pdf_path), str(out), dpi, 0, None))
 
     if not imgs:
         raise RuntimeError("PDF rasterization produced no images.")
     return imgs
 
 
+def pdf_to_arrays(pdf_path: str | Path, dpi: int = DEFAULT_RENDER_DPI) -> List["np.ndarray"]:
+    """
+    Rasterize a PDF straight to grayscale (H, W) uint8 arrays, one per page.
+    Skips PNG encode/decode; the arrays can go directly to EasyOCR.
+    """
+    import numpy as np
+
+    pages = [
+        np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+        for pix in _iter_gray_pixmaps(pdf_path, dpi)
+    ]
+    if not pages:
+        raise RuntimeError("PDF rasterization produced no images.")
+    return pages
+
+
 # ---------------------------
 # DOCX → PDF → PNG
 # ---------------------------
@@ -85,7 +148,7 @@ def docx_to_pdf(docx_path: str | Path, out_pdf: str | Path) -> Path:
 # ---------------------------
 # Unified entry point
 # ---------------------------
-def render_paper_to_images(path: str | Path, out_dir: str, dpi: int = 220) -> List[Path]:
+def render_paper_to_images(path: str | Path, out_dir: str, dpi: int = DEFAULT_RENDER_DPI) -> List[Path]:
     """
     Render a DOCX or PDF exam paper into per-page PNG images.
     - If input is PDF → direct rasterization.
@@ -0,0 +1,110 @@
+# backend/src/core/semantic_cache.py
+# -*- coding: utf-8 -*-
+"""
+Near-duplicate lookup in front of the exact mock cache.
+
+- Embeds the reference text (all-MiniLM-L6-v2, unit-normalized) and searches
+  a FAISS inner-product index; cosine >= threshold counts as the same paper.
+- Each vector maps back to an exact-cache key, so outputs live only in the
+  exact cache; the index stores (scope, key) pairs alongside the vectors.
+- Opt-in: set MOCKGEN_SEMANTIC_THRESHOLD (e.g. 0.95). Needs faiss and
+  sentence-transformers (requirements-semantic.txt, not in the base image);
+  both are imported lazily (torch is heavy).
+"""
+
+from __future__ import annotations
+
+import importlib.util
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, List, Optional
+
+_HAS_SEMANTIC = (
+    importlib.util.find_spec("faiss") is not None
+    and importlib.util.find_spec("sentence_transformers") is not None
+)
+
+SEMANTIC_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SEMANTIC_TEXT_CHARS = 8000   # the embedding model truncates long inputs anyway
+SEMANTIC_TOP_K = 8           # neighbours checked for a matching scope
+
+_WARNED_MISSING = False
+
+
+def semantic_threshold() -> Optional[float]:
+    """Cosine threshold from MOCKGEN_SEMANTIC_THRESHOLD, or None if disabled."""
+    global _WARNED_MISSING
+    raw = os.getenv("MOCKGEN_SEMANTIC_THRESHOLD")
+    if not raw:
+        return None
+    if not _HAS_SEMANTIC:
+        if not _WARNED_MISSING:
+            _WARNED_MISSING = True
+            print("[WARNING] MOCKGEN_SEMANTIC_THRESHOLD is set but faiss/sentence-transformers "
+                  "are not installed (pip install -r requirements-semantic.txt); semantic cache disabled")
+        return None
+    try:
+        return float(raw)
+    except ValueError:
+        return None
+
+
+class SemanticIndex:
+    """FAISS IndexFlatIP persisted next to the exact cache."""
+
+    def __init__(self, directory: str):
+        import faiss
+
+        self._dir = Path(directory)
+        self._dir.mkdir(parents=True, exist_ok=True)
+        self._index_path = self._dir / "semantic.faiss"
+        self._meta_path = self._dir / "semantic.json"
+        self._lock = threading.Lock()
+        self._model = None
+
+        if self._index_path.exists() and self._meta_path.exists():
+            self._index = faiss.read_index(str(self._index_path))
+            self._meta: List[List[str]] = json.loads(self._meta_path.read_text(encoding="utf-8"))
+        else:
+            self._index = None
+            self._meta = []
+
+    def embed(self, text: str) -> Any:
+        """(1, dim) float32 unit vector for `text`."""
+        import numpy as np
+
+        with self._lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+                self._model = SentenceTransformer(SEMANTIC_MODEL)
+            model = self._model
+        vec = model.encode([text[:SEMANTIC_TEXT_CHARS]], normalize_embeddings=True)
+        return np.asarray(vec, dtype="float32")
+
+    def lookup(self, emb: Any, scope: str, threshold: float) -> Optional[str]:
+        """Exact-cache key of the closest entry in `scope` with cosine >= threshold."""
+        with self._lock:
+            if self._index is None or self._index.ntotal == 0:
+                return None
+            scores, ids = self._index.search(emb, min(SEMANTIC_TOP_K, self._index.ntotal))
+            meta = self._meta
+        for score, idx in zip(scores[0], ids[0]):
+            if idx < 0 or score < threshold:
+                break  # results are sorted by score
+            entry_scope, key = meta[idx]
+            if entry_scope == scope:
+                return key
+        return None
+
+    def add(self, emb: Any, scope: str, key: str) -> None:
+        import faiss
+
+        with self._lock:
+            if self._index is None:
+                self._index = faiss.IndexFlatIP(emb.shape[1])
+            self._index.add(emb)
+            self._meta.append([scope, key])
+            faiss.write_index(self._index, str(self._index_path))
+            self._meta_path.write_text(json.dumps(self._meta), encoding="utf-8")